@@ -1,20 +1,66 @@
+import time
 from typing import Tuple, List, Optional
 from Engine.Board import Board
+from Engine.SparseBoard import SparseBoard
+from AI.TranspositionTable import TranspositionTable
+from AI.Evaluator import Evaluator
+from AI.OpeningBook import OpeningBook
+from AI.ThreatSearch import ThreatSearch, SearchTimeout
+from AI.SearchStats import SearchStats, timed
 
 # Notes: As the depth of the minimax algorithm increases, the time complexity increases exponentially.
 # So plz be careful with the depth you choose.
 # The depth of the minimax algorithm is set to 3 by default, which is a good balance between performance and accuracy.
 # BTW the AI is not very strong, so you can increase the depth to 4 or 5 if you want a stronger AI. (Be careful with the time it takes to calculate the move)
 # The AI uses a simple heuristic evaluation function to evaluate the board state.
+# If you need a bound on the time per move rather than on the depth, use ai_move with a time_limit_ms.
 class AI:
-    def __init__(self, board_size: int = 15, win_length: int = 5, player_stone: int = 2, opponent_stone: int = 1, max_depth: int = 2):
+    # Ordering bonus for a killer move, it ranks above an open three but below a four
+    KILLER_BONUS = 800
+    
+    # Default evaluation weights for different patterns
+    WEIGHTS = {
+        'five': 100000,        # Win
+        'open_four': 10000,    # Four in a row with open ends
+        'four': 1000,          # Four in a row with one end blocked
+        'open_three': 500,     # Three in a row with open ends
+        'three': 100,          # Three in a row with one end blocked
+        'open_two': 50,        # Two in a row with open ends
+        'two': 10              # Two in a row with one end blocked
+    }
+    
+    # Nodes between two clock polls, a node with its move ordering and threat scans takes a fraction of a ms
+    NODE_POLL = 64
+    
+    # Half width of the aspiration window around the expected root score, about an open three
+    ASPIRATION_WINDOW = 500
+    
+    # Extra beam width per remaining ply above the last, mistakes far from the leaves cost more
+    BEAM_GROWTH = 2
+    
+    def __init__(self, board_size: int = 15, win_length: int = 5, player_stone: int = 2, opponent_stone: int = 1, max_depth: int = 2, tt_size: int = 1 << 16,
+                 opening_book: Optional[str] = None, threat_depth: int = 8, use_vct: bool = False, collect_stats: bool = False,
+                 beam_width: int = 0, lmr_moves: int = 0, lmr_reduction: int = 1):
         """
         Args:
-            board_size: Size of the Gomoku board (typically 15x15)
+            board_size: Size of the Gomoku board (typically 15x15), the history table starts out
+                this big; moves are always searched on the board they are given, whatever its size
             win_length: Number of stones in a row needed to win (typically 5)
             player_stone: Stone value for the AI player (typically 1 or 2)
             opponent_stone: Stone value for the opponent (typically 2 or 1)
             max_depth: Maximum depth for the minimax algorithm
+            tt_size: Number of transposition table buckets (caps its memory use)
+            opening_book: Path of an opening book file (see Tools/BuildOpeningBook.py), consulted before searching
+            threat_depth: Maximum attacker moves of the forced wins looked for before searching (0 turns it off)
+            use_vct: Also look for wins by threes (VCT), not only by fours (VCF); slower
+            collect_stats: Keep a SearchStats of every move in self.last_stats (costs some speed)
+            beam_width: Moves searched below the root besides the forcing ones (fours, threes and the
+                blocks of the opponent's), best ordered first; BEAM_GROWTH more per remaining ply
+                above the last. 0 searches every move
+            lmr_moves: Moves searched to full depth below the root before the later quiet ones are
+                searched lmr_reduction plies shallower (again in full if they beat alpha). 0 turns
+                reductions off
+            lmr_reduction: Plies a late quiet move is reduced by
         """
         self.board_size = board_size
         self.win_length = win_length
@@ -22,16 +68,55 @@ class AI:
         self.opponent_stone = opponent_stone
         self.max_depth = max_depth
         
-        # Evaluation weights for different patterns
-        self.weights = {
-            'five': 100000,        # Win
-            'open_four': 10000,    # Four in a row with open ends
-            'four': 1000,          # Four in a row with one end blocked
-            'open_three': 500,     # Three in a row with open ends
-            'three': 100,          # Three in a row with one end blocked
-            'open_two': 50,        # Two in a row with open ends
-            'two': 10              # Two in a row with one end blocked
-        }
+        # Depth reached by the last ai_move call and the deadline of the running search (if any)
+        self.last_depth = 0
+        self._deadline = None
+        
+        # Set from another thread to abort the running search like a timeout: ai_move returns
+        # its best move so far, the other entry points raise SearchTimeout. Whoever sets it clears it.
+        self.cancelled = False
+        
+        # Search nodes visited since this AI was created
+        self.nodes = 0
+        
+        # Search results by Zobrist key, so transposed positions are not searched twice
+        self.tt = TranspositionTable(tt_size)
+        
+        # Move ordering state: two killer moves per ply (moves that caused a cutoff in a sibling
+        # node) and a history score per stone and cell that is kept across searches
+        self.killers = []
+        self.history = [None] + [[0] * (board_size * (board_size + 1)) for _ in range(2)]
+        self._root_depth = 0
+        
+        # Selective search, both off by default: every move is searched to full depth
+        self.beam_width = beam_width
+        self.lmr_moves = lmr_moves
+        self.lmr_reduction = lmr_reduction
+        
+        # (moves on the board, score) of the last root search, the expected score of the next one
+        self._last_root = None
+        
+        # Evaluation weights for different patterns, this AI's own copy
+        self.weights = dict(self.WEIGHTS)
+        
+        # Memory-mapped, so it costs no load time and is shared by every process using the same file
+        self.book = OpeningBook(opening_book) if opening_book else None
+        
+        # Follows the board move by move so leaf evaluation does not rescan the whole board
+        self.evaluator = Evaluator(self.weights, win_length)
+        
+        # Forced wins by continuous fours (or threes) are found far deeper than the main search reaches
+        self.threat_depth = threat_depth
+        self.use_vct = use_vct
+        self.threat_search = ThreatSearch(win_length, should_stop=self._should_stop)
+        
+        # Counters and timers of the last move, only when asked for: the hot methods are then
+        # wrapped on this instance, so an AI without stats pays nothing for them
+        self.collect_stats = collect_stats
+        self.last_stats = None
+        self._stats = None
+        if collect_stats:
+            self._instrument()
     
     def ai_move_with_pruning(self, board: Board) -> Tuple[int, int]:
         """
@@ -41,44 +126,247 @@ class AI:
         Returns:
             Tuple of (row, col) for the best move
         """
+        if isinstance(board, SparseBoard):
+            return self._on_window(board, self.max_depth, type(self).ai_move_with_pruning)
+        
+        # Known opening positions are answered from the book without searching
+        book_move = self._book_move(board)
+        if book_move is not None:
+            return book_move
+        
         # Get all valid moves (empty cells)
         valid_moves = self._get_valid_moves(board)
         
         # If this is the first move, play in the center or near center
         if self._is_board_empty(board):
-            center = self.board_size // 2
+            center = board.size // 2
             return (center, center)
         
         # If there's only one valid move, take it
         if len(valid_moves) == 1:
             return valid_moves[0]
         
-        # Use minimax with alpha-beta pruning to find the best move
+        # A forced win (or the only defence against one) needs no full-width search
+        threat_move = self._threat_move(board)
+        if threat_move is not None:
+            return threat_move
+        
+        self._new_search(board)
+        best_move, _ = self._search_root(board, valid_moves, self.max_depth, self._expected_score(board))
+        return best_move
+    
+    def ai_move(self, board: Board, time_limit_ms: Optional[float] = None, max_depth: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Iterative deepening around the alpha-beta search: depth 1, 2, 3, ... until the time
+        budget runs out. An unfinished iteration is thrown away, its move is never played.
+        The depth of the deepest completed iteration is kept in self.last_depth.
+        
+        Args:
+            board: Current state of the board
+            time_limit_ms: Wall-clock budget for this move, None to only stop at max_depth
+            max_depth: Deepest iteration to run (defaults to self.max_depth without a time
+                limit and to the number of empty cells with one)
+            
+        Returns:
+            Tuple of (row, col) for the best move
+        """
+        if isinstance(board, SparseBoard):
+            # Deeper than the window was cut for, the search still runs, but sees a nearer edge
+            return self._on_window(board, max_depth or self.max_depth, type(self).ai_move, time_limit_ms, max_depth)
+        
+        start = time.perf_counter()
+        self.last_depth = 0
+        # Known opening positions are answered from the book without searching
+        book_move = self._book_move(board)
+        if book_move is not None:
+            return book_move
+        
+        valid_moves = self._get_valid_moves(board)
+        
+        if self._is_board_empty(board):
+            center = board.size // 2
+            return (center, center)
+        
+        if len(valid_moves) == 1:
+            return valid_moves[0]
+        
+        if max_depth is None:
+            max_depth = self.max_depth if time_limit_ms is None else board.size * board.size - len(board.history)
+        
+        # The threat search runs on the same clock as the main search
+        if time_limit_ms is not None:
+            self._deadline = start + time_limit_ms / 1000
+        try:
+            # A forced win (or the only defence against one) needs no full-width search
+            threat_move = self._threat_move(board)
+        except SearchTimeout:
+            # Out of time before searching at all, the move that looks best at a glance
+            self._deadline = None
+            return self._order_moves(board, valid_moves, self.player_stone, 0)[0]
+        if threat_move is not None:
+            self._deadline = None
+            return threat_move
+        
+        self._new_search(board)
+        best_move = valid_moves[0]
+        history_length = len(board.history)
+        # Scores by depth, the window of an iteration is centred on the one two plies shallower: the
+        # evaluation favours whoever moved last, so scores swing between odd and even depths
+        scores = [self._expected_score(board)]
+        try:
+            for depth in range(1, max_depth + 1):
+                # The previous iteration's best move is tried first thanks to the transposition table
+                expected = scores[depth - 2] if depth > 2 else scores[-1]
+                best_move, best_score = self._search_root(board, valid_moves, depth, expected)
+                scores.append(best_score)
+                self.last_depth = depth
+                
+                # A forced result will not change by looking deeper
+                if best_score in (float('inf'), float('-inf')):
+                    break
+        except SearchTimeout:
+            # Take back the moves the aborted search left on the board
+            while len(board.history) > history_length:
+                self._unmake_move(board)
+        finally:
+            self._deadline = None
+        
+        return best_move
+    
+    def _search_root(self, board: Board, valid_moves: List[Tuple[int, int]], depth: int,
+                     expected: Optional[float] = None) -> Tuple[Tuple[int, int], float]:
+        """
+        Args:
+            board: Current state of the board
+            valid_moves: Candidate moves for the AI player, reordered in place
+            depth: Depth to search to
+            expected: Likely score of the position, the search starts with a narrow (aspiration)
+                window around it and only widens it if the score falls outside; None for a full window
+            
+        Returns:
+            Tuple of (best move, its score)
+        """
+        key, stored = self._prepare_root(board, valid_moves, depth)
+        if stored is not None:
+            return stored
+        
+        alpha, beta = float('-inf'), float('inf')
+        if expected is not None and abs(expected) != float('inf'):
+            alpha, beta = expected - self.ASPIRATION_WINDOW, expected + self.ASPIRATION_WINDOW
+        while True:
+            best_move, best_score = self._search_root_window(board, valid_moves, depth, alpha, beta)
+            # Outside the window the score is only a bound, search again with that side open
+            if best_score <= alpha and alpha != float('-inf'):
+                alpha = float('-inf')
+            elif best_score >= beta and beta != float('inf'):
+                beta = float('inf')
+            else:
+                break
+        
+        self._finish_root(board, key, depth, best_move, best_score)
+        return best_move, best_score
+    
+    def _search_root_window(self, board: Board, valid_moves: List[Tuple[int, int]], depth: int,
+                            alpha: float, beta: float) -> Tuple[Tuple[int, int], float]:
+        """
+        Args:
+            board: Current state of the board
+            valid_moves: Candidate moves for the AI player, best ordered first
+            depth: Depth to search to
+            alpha: Lower bound of the window
+            beta: Upper bound of the window
+            
+        Returns:
+            Tuple of (best move, its score), the score is only a bound if it is not inside the window
+        """
         best_score = float('-inf')
         best_move = None
-        alpha = float('-inf')
-        beta = float('inf')
         
         for move in valid_moves:
-            row, col = move
-            # Make the move
-            board.matrix[row][col] = self.player_stone
-            
-            # Calculate score using minimax
-            score = self._minimax_with_pruning(board, self.max_depth - 1, False, alpha, beta)
-
-            # Undo the move
-            board.matrix[row][col] = 0
+            # Principal variation search: the first move sets the score, the others are only
+            # tested against it with a null window and searched in full if they beat it
+            if best_move is None or alpha == float('-inf'):
+                score = self._search_root_move(board, move, depth, alpha, beta)
+            else:
+                score = self._search_root_move(board, move, depth, alpha, alpha + 1)
+                if alpha < score < beta:
+                    score = self._search_root_move(board, move, depth, alpha, beta)
             
             # Update best move if needed
-            if score > best_score:
+            if score > best_score or best_move is None:
                 best_score = score
                 best_move = move
             
-            # Update alpha
             alpha = max(alpha, best_score)
+            if alpha >= beta:
+                break
         
-        return best_move
+        return best_move, best_score
+    
+    def _begin_root(self, depth: int):
+        # Plies are counted from the root, every ply needs its killer slots
+        self._root_depth = depth
+        if len(self.killers) < depth:
+            self.killers.extend([None, None] for _ in range(depth - len(self.killers)))
+    
+    def _prepare_root(self, board: Board, valid_moves: List[Tuple[int, int]], depth: int):
+        """
+        Args:
+            board: Current state of the board
+            valid_moves: Candidate moves for the AI player, sorted best first in place
+            depth: Depth to search to
+            
+        Returns:
+            Tuple of (transposition key of the root, stored (move, score) if the root was
+            already searched deep enough, None otherwise)
+        """
+        self._begin_root(depth)
+        
+        # A result from an earlier search of this same position may already be deep enough
+        key = self._tt_key(board, True)
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None and entry[4] in valid_moves:
+            if entry[1] >= depth and entry[3] == TranspositionTable.EXACT:
+                return key, (entry[4], entry[2])
+            tt_move = entry[4]
+        valid_moves[:] = self._order_moves(board, valid_moves, self.player_stone, 0, tt_move)
+        return key, None
+    
+    def _search_root_move(self, board: Board, move: Tuple[int, int], depth: int, alpha: float,
+                          beta: float = float('inf')) -> float:
+        """
+        Args:
+            board: Current state of the board
+            move: Root move to score
+            depth: Depth of the root search
+            alpha: Best score already guaranteed at the root
+            beta: Score above which the exact value is not needed
+            
+        Returns:
+            Score of the move, only an upper bound if it is not above alpha (a lower bound if
+            it is not below beta)
+        """
+        row, col = move
+        # Make the move
+        self._make_move(board, row, col, self.player_stone)
+        
+        score = -self._negamax(board, depth - 1, self.opponent_stone, -beta, -alpha, move)
+        
+        # Undo the move
+        self._unmake_move(board)
+        return score
+    
+    def _finish_root(self, board: Board, key: int, depth: int, best_move: Tuple[int, int], best_score: float):
+        self._update_history(board, best_move, self.player_stone, depth)
+        self.tt.store(key, depth, best_score, TranspositionTable.EXACT, best_move)
+        self._last_root = (len(board.history), best_score)
+    
+    def _expected_score(self, board: Board) -> Optional[float]:
+        # The score of this AI's previous move, if the position is that one two plies on
+        if self._last_root is not None and self._last_root[0] + 2 == len(board.history):
+            return self._last_root[1]
+        return None
     
     def ai_move_without_pruning(self, board: Board) -> Tuple[int, int]:
         """
@@ -88,12 +376,20 @@ class AI:
         Returns:
             Tuple of (row, col) for the best move
         """
+        if isinstance(board, SparseBoard):
+            return self._on_window(board, self.max_depth, type(self).ai_move_without_pruning)
+        
+        # Known opening positions are answered from the book without searching
+        book_move = self._book_move(board)
+        if book_move is not None:
+            return book_move
+        
         # Get all valid moves (empty cells)
         valid_moves = self._get_valid_moves(board)
         
         # If this is the first move, play in the center or near center
         if self._is_board_empty(board):
-            center = self.board_size // 2
+            center = board.size // 2
             return (center, center)
         
         # If there's only one valid move, take it
@@ -107,98 +403,374 @@ class AI:
         for move in valid_moves:
             row, col = move
             # Make the move
-            board.matrix[row][col] = self.player_stone
+            self._make_move(board, row, col, self.player_stone)
             
             # Calculate score using minimax
-            score = self._minimax_without_pruning(board, self.max_depth - 1, False)
+            score = -self._negamax_without_pruning(board, self.max_depth - 1, self.opponent_stone, move)
             
             # Undo the move
-            board.matrix[row][col] = 0
+            self._unmake_move(board)
             
-            # Update best move if needed
-            if score > best_score:
+            # Update best move if needed (a lost position still has to return a move)
+            if score > best_score or best_move is None:
                 best_score = score
                 best_move = move
         
         return best_move
     
-    def _minimax_with_pruning(self, board: Board, depth: int, is_maximizing: bool, alpha: float, beta: float) -> float:
+    def _negamax(self, board: Board, depth: int, stone: int, alpha: float, beta: float,
+                 last_move: Optional[Tuple[int, int]] = None) -> float:
         """
+        Alpha-beta in negamax form: scores are from the point of view of the side to move, so
+        both sides share one branch and a child's score is negated for its parent. Moves after
+        the first are searched with a null window (principal variation search), which only tells
+        whether they beat the best score so far; the few that do are searched again in full.
+        
         Args:
             board: Current state of the board
-            depth: Current depth in the search tree
-            is_maximizing: True if maximizing player's turn, False otherwise
-            alpha: Alpha value for pruning
-            beta: Beta value for pruning
+            depth: Remaining depth to search
+            stone: Stone value of the side to move
+            alpha: Score the side to move is already guaranteed
+            beta: Score above which the opponent avoids this position
+            last_move: Move that led to this position, lets the terminal check look only at its lines
             
         Returns:
-            Score for the current board state
+            Score for the side to move, only an upper bound if not above alpha and a lower bound
+            if not below beta
         """
-        # Check if game is over or max depth reached
-        if depth == 0 or self._is_terminal_state(board):
-            return self._evaluate_board(board)
+        # Poll the clock only every NODE_POLL nodes, the check is not free
+        self.nodes += 1
+        if not self.nodes % self.NODE_POLL and self._should_stop():
+            raise SearchTimeout()
+        
+        # Reuse the result of this position if it was already searched deep enough
+        key = board.hash ^ board.side_keys[stone]
+        entry = self.tt.probe(key)
+        tt_move = None
+        if entry is not None:
+            _, entry_depth, entry_score, flag, tt_move, _ = entry
+            if entry_depth >= depth:
+                if flag == TranspositionTable.EXACT:
+                    return entry_score
+                elif flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, entry_score)
+                else:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
         
-        valid_moves = self._get_valid_moves(board)
+        # Check if game is over or max depth reached
+        if depth == 0 or self._is_terminal_state(board, last_move):
+            score = self._evaluate_board(board)
+            if stone != self.player_stone:
+                score = -score
+            self.tt.store(key, depth, score, TranspositionTable.EXACT, None)
+            return score
+        
+        ply = self._root_depth - depth
+        valid_moves = self._order_moves(board, self._get_valid_moves(board), stone, ply, tt_move)
+        other = self.opponent_stone if stone == self.player_stone else self.player_stone
+        forcing = 0
+        if self.beam_width or self.lmr_moves:
+            valid_moves, forcing = self._select_moves(board, valid_moves, stone, other, depth)
+        reduction = min(self.lmr_reduction, depth - 1) if self.lmr_moves else 0
+        stride = board.stride
+        window_alpha, window_beta = alpha, beta
+        best_score = float('-inf')
+        best_move = None
         
-        if is_maximizing:
-            max_eval = float('-inf')
-            for move in valid_moves:
-                row, col = move
-                board.matrix[row][col] = self.player_stone
-                eval = self._minimax_with_pruning(board, depth - 1, False, alpha, beta)
-                board.matrix[row][col] = 0
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break  # Beta cutoff
-            return max_eval
+        for index, move in enumerate(valid_moves):
+            row, col = move
+            self._make_move(board, row, col, stone)
+            if best_move is None or alpha == float('-inf'):
+                score = -self._negamax(board, depth - 1, other, -beta, -alpha, move)
+            else:
+                # A late quiet move is first searched shallower, it is unlikely to be any good
+                late = reduction > 0 and index >= self.lmr_moves and not forcing >> (row * stride + col) & 1
+                score = -self._negamax(board, depth - 1 - (reduction if late else 0), other, -alpha - 1, -alpha, move)
+                if late and score > alpha:
+                    score = -self._negamax(board, depth - 1, other, -alpha - 1, -alpha, move)
+                if alpha < score < beta:
+                    score = -self._negamax(board, depth - 1, other, -beta, -alpha, move)
+            self._unmake_move(board)
+            if score > best_score or best_move is None:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self._record_cutoff(board, move, stone, ply, depth)
+                break
+        
+        # Scores outside the window are only bounds on the true value
+        if best_score <= window_alpha:
+            flag = TranspositionTable.UPPER
+        elif best_score >= window_beta:
+            flag = TranspositionTable.LOWER
         else:
-            min_eval = float('inf')
-            for move in valid_moves:
-                row, col = move
-                board.matrix[row][col] = self.opponent_stone
-                eval = self._minimax_with_pruning(board, depth - 1, True, alpha, beta)
-                board.matrix[row][col] = 0
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break  # Alpha cutoff
-            return min_eval
-        
-    def _minimax_without_pruning(self, board: Board, depth: int, is_maximizing: bool) -> float:
+            flag = TranspositionTable.EXACT
+        self.tt.store(key, depth, best_score, flag, best_move)
+        return best_score
+    
+    def _negamax_without_pruning(self, board: Board, depth: int, stone: int,
+                                 last_move: Optional[Tuple[int, int]] = None) -> float:
         """
         Args:
             board: Current state of the board
-            depth: Current depth in the search tree
-            is_maximizing: True if maximizing player's turn, False otherwise
+            depth: Remaining depth to search
+            stone: Stone value of the side to move
+            last_move: Move that led to this position, lets the terminal check look only at its lines
             
         Returns:
-            Score for the current board state
+            Score for the side to move
         """
+        # Only a cancel stops it, the plain minimax has no time limit
+        self.nodes += 1
+        if self.cancelled and not self.nodes % self.NODE_POLL:
+            raise SearchTimeout()
+        
         # Check if game is over or max depth reached
-        if depth == 0 or self._is_terminal_state(board):
-            return self._evaluate_board(board)
+        if depth == 0 or self._is_terminal_state(board, last_move):
+            score = self._evaluate_board(board)
+            return score if stone == self.player_stone else -score
         
-        valid_moves = self._get_valid_moves(board)
+        other = self.opponent_stone if stone == self.player_stone else self.player_stone
+        best_score = float('-inf')
+        for move in self._get_valid_moves(board):
+            row, col = move
+            self._make_move(board, row, col, stone)
+            best_score = max(best_score, -self._negamax_without_pruning(board, depth - 1, other, move))
+            self._unmake_move(board)
+        return best_score
+    
+    def _on_window(self, board: SparseBoard, depth: int, search, *args) -> Tuple[int, int]:
+        """
+        Args:
+            board: Sparse board with the AI to move
+            depth: Depth the search will reach, sets how much room the window leaves around the stones
+            search: Unbound entry point to run on the window, e.g. AI.ai_move_with_pruning
+            *args: Further arguments of the entry point
+            
+        Returns:
+            The entry point's move, on the sparse board
+        """
+        view, rows, cols = board.window(self._window_margin(depth))
+        row, col = search(self, view, *args)
+        return rows[row], cols[col]
+    
+    def _window_margin(self, depth: int) -> int:
+        # Every ply may place a stone CANDIDATE_DISTANCE further out, and the shapes it makes are
+        # read up to win_length + 1 cells beyond that; within the margin no window edge is seen
+        return Board.CANDIDATE_DISTANCE * depth + self.win_length + 1
+    
+    def _book_move(self, board: Board) -> Optional[Tuple[int, int]]:
+        if self.book is None:
+            return None
+        move = self.book.lookup(board, self.player_stone)
+        if move is not None and board.get(*move) == 0:
+            return move
+        return None
+    
+    def principal_variation(self, board: Board, move: Tuple[int, int], length: int) -> List[Tuple[int, int]]:
+        """
+        Args:
+            board: Position the AI moved from
+            move: Move the AI chose
+            length: Maximum number of moves to return
+            
+        Returns:
+            The expected line of play starting with the move, followed through the best moves
+            of the transposition table
+        """
+        if isinstance(board, SparseBoard):
+            # The same window the move was searched on, so its positions are in the table
+            view, rows, cols = board.window(self._window_margin(self.max_depth))
+            line = self.principal_variation(view, (rows.index(move[0]), cols.index(move[1])), length)
+            return [(rows[row], cols[col]) for row, col in line]
+        
+        line = [move]
+        board.make_move(move[0], move[1], self.player_stone)
+        is_maximizing = False
+        while len(line) < length and not board.has_five(board.last_move[2]):
+            entry = self.tt.probe(self._tt_key(board, is_maximizing))
+            if entry is None or entry[4] is None or board.get(*entry[4]) != 0:
+                break
+            line.append(entry[4])
+            board.make_move(entry[4][0], entry[4][1], self.player_stone if is_maximizing else self.opponent_stone)
+            is_maximizing = not is_maximizing
+        for _ in line:
+            board.unmake_move()
+        return line
+    
+    def _instrument(self):
+        stats_of = lambda: self._stats
+        self._get_valid_moves = timed(self._get_valid_moves, stats_of, 'move_generation_ms')
+        self._order_moves = timed(self._order_moves, stats_of, 'move_generation_ms')
+        self._evaluate_board = timed(self._evaluate_board, stats_of, 'evaluation_ms', 'leaf_evaluations')
+        self._is_terminal_state = timed(self._is_terminal_state, stats_of, 'win_check_ms')
+        self._threat_move = timed(self._threat_move, stats_of, 'threat_search_ms')
+        
+        record_cutoff = self._record_cutoff
+        def counted_cutoff(board, move, stone, ply, depth):
+            if self._stats is not None:
+                self._stats.count_cutoff(ply)
+            record_cutoff(board, move, stone, ply, depth)
+        self._record_cutoff = counted_cutoff
+        
+        probe = self.tt.probe
+        def counted_probe(key):
+            entry = probe(key)
+            if entry is not None and self._stats is not None:
+                self._stats.tt_hits += 1
+            return entry
+        self.tt.probe = counted_probe
+        
+        for name in ('ai_move_with_pruning', 'ai_move', 'ai_move_without_pruning'):
+            setattr(self, name, self._with_stats(getattr(self, name), name))
+    
+    def _with_stats(self, search, name: str):
+        def wrapper(board: Board, *args, **kwargs):
+            stats = SearchStats(name)
+            self._stats = stats
+            nodes = self.nodes
+            self.last_depth = 0
+            start = time.perf_counter()
+            try:
+                move = search(board, *args, **kwargs)
+            finally:
+                self._stats = None
+            stats.time_ms = (time.perf_counter() - start) * 1000
+            stats.move = move
+            stats.nodes = self.nodes - nodes
+            if stats.nodes:
+                stats.depth = self.last_depth if name == 'ai_move' else self.max_depth
+            # The plain minimax keeps no table to follow
+            length = 1 if name == 'ai_move_without_pruning' else max(1, stats.depth)
+            stats.principal_variation = self.principal_variation(board, move, length)
+            self.last_stats = stats
+            return move
+        return wrapper
+    
+    def _should_stop(self) -> bool:
+        # The move deadline has passed or the search was cancelled
+        return self.cancelled or (self._deadline is not None and time.perf_counter() >= self._deadline)
+    
+    def _threat_move(self, board: Board) -> Optional[Tuple[int, int]]:
+        """
+        Args:
+            board: Current state of the board, with the AI to move
+            
+        Returns:
+            First move of a forced win, else the move that stops the opponent's forced win,
+            None if neither side has one (or threat_depth is 0)
+        """
+        if self.threat_depth <= 0:
+            return None
+        line = self.threat_search.find_win(board, self.player_stone, self.threat_depth, self.use_vct)
+        if line is not None:
+            return line[0]
+        return self.threat_search.find_defence(board, self.player_stone, self.threat_depth, self.use_vct)
+    
+    def _make_move(self, board: Board, row: int, col: int, stone: int):
+        board.make_move(row, col, stone)
+        self.evaluator.update(board, row, col, stone)
+    
+    def _unmake_move(self, board: Board):
+        row, col, stone = board.unmake_move()
+        self.evaluator.update(board, row, col, stone)
+    
+    def _tt_key(self, board: Board, is_maximizing: bool) -> int:
+        # The same stones with a different side to move are a different search node
+        return board.hash ^ board.side_keys[self.player_stone if is_maximizing else self.opponent_stone]
+    
+    def _new_search(self, board: Board):
+        # Killers are only meaningful within one position, history is aged instead of cleared
+        self.tt.new_search()
+        self.killers = []
+        if self._fit_history(board):
+            for stone in (1, 2):
+                self.history[stone] = [value >> 1 for value in self.history[stone]]
+    
+    def _fit_history(self, board: Board) -> bool:
+        # Starts the history over for a board of another size (its cells are not the ones the
+        # scores were for), False if it had to
+        cells = board.size * board.stride
+        if len(self.history[1]) == cells:
+            return True
+        self.history = [None] + [[0] * cells for _ in range(2)]
+        return False
+    
+    def _order_moves(self, board: Board, moves: List[Tuple[int, int]], stone: int, ply: int,
+                     tt_move: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+        """
+        Alpha-beta only prunes well when the best move is searched first. Moves are tried in this order:
+        transposition table move, then by the threat they create or block (with a bonus for killer moves),
+        then by history score. Equal moves keep their row-major order.
         
-        if is_maximizing:
-            max_eval = float('-inf')
-            for move in valid_moves:
-                row, col = move
-                board.matrix[row][col] = self.player_stone
-                eval = self._minimax_without_pruning(board, depth - 1, False)
-                board.matrix[row][col] = 0
-                max_eval = max(max_eval, eval)
-            return max_eval
-        else:
-            min_eval = float('inf')
-            for move in valid_moves:
-                row, col = move
-                board.matrix[row][col] = self.opponent_stone
-                eval = self._minimax_without_pruning(board, depth - 1, True)
-                board.matrix[row][col] = 0
-                min_eval = min(min_eval, eval)
-            return min_eval
+        Args:
+            board: Current state of the board
+            moves: Candidate moves
+            stone: Stone value of the player to move
+            ply: Distance from the root, selects the killer slots
+            tt_move: Best move stored in the transposition table for this position, if any
+            
+        Returns:
+            The moves sorted best first
+        """
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+        history = self.history[stone]
+        stride = board.stride
+        threat_score = self.evaluator.threat_score
+        
+        def key(move):
+            if move == tt_move:
+                return (float('inf'), 0)
+            row, col = move
+            # The threats the move makes and the ones it blocks
+            score = threat_score(board, row * stride + col)
+            if move == killers[0]:
+                score += self.KILLER_BONUS
+            elif move == killers[1]:
+                score += self.KILLER_BONUS // 2
+            return (score, history[row * stride + col])
+        
+        return sorted(moves, key=key, reverse=True)
+    
+    def _select_moves(self, board: Board, moves: List[Tuple[int, int]], stone: int, opponent: int,
+                      depth: int) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Args:
+            board: Current state of the board
+            moves: Candidate moves, sorted best first
+            stone: Stone value of the player to move
+            opponent: Stone value of the other player
+            depth: Remaining depth of the node
+            
+        Returns:
+            Tuple of (the moves to search, best first, and a bitmask of the forcing cells). The beam
+            keeps the first moves and every forcing move after them.
+        """
+        threats = self.threat_search
+        forcing = (threats.five_cells(board, stone) | threats.four_cells(board, stone) | threats.three_cells(board, stone)
+                   | threats.five_cells(board, opponent) | threats.three_defence_cells(board, opponent))
+        if not self.beam_width:
+            return moves, forcing
+        
+        width = self.beam_width + self.BEAM_GROWTH * (depth - 1)
+        stride = board.stride
+        return moves[:width] + [move for move in moves[width:] if forcing >> (move[0] * stride + move[1]) & 1], forcing
+    
+    def _record_cutoff(self, board: Board, move: Tuple[int, int], stone: int, ply: int, depth: int):
+        # The move refuted this node, so it is likely to refute its siblings too
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self._update_history(board, move, stone, depth)
+    
+    def _update_history(self, board: Board, move: Optional[Tuple[int, int]], stone: int, depth: int):
+        # Deeper subtrees are worth more, a cutoff near the root saves the most work
+        if move is not None:
+            self.history[stone][move[0] * board.stride + move[1]] += depth * depth
     
     def _get_valid_moves(self, board: Board) -> List[Tuple[int, int]]:
         """
@@ -212,33 +784,24 @@ class AI:
         
         # If the board is empty, return the center position
         if self._is_board_empty(board):
-            center = self.board_size // 2
+            center = board.size // 2
             return [(center, center)]
         
-        # Consider cells that are adjacent to existing stones
-        for i in range(self.board_size):
-            for j in range(self.board_size):
-                if board.matrix[i][j] == 0:  # Empty cell
-                    # Check if this cell is adjacent to any existing stone
-                    if self._has_neighbor(board, i, j):
-                        valid_moves.append((i, j))
+        # Consider cells that are adjacent to existing stones, the board keeps this set up to date
+        stride = board.stride
+        for idx in Board.bit_indices(board.candidates):
+            valid_moves.append(divmod(idx, stride))
         
         # If no valid moves found (unlikely), return all empty cells
         if not valid_moves:
-            for i in range(self.board_size):
-                for j in range(self.board_size):
-                    if board.matrix[i][j] == 0:
-                        valid_moves.append((i, j))
+            for idx in Board.bit_indices(board.full_mask & ~board.occupied):
+                valid_moves.append(divmod(idx, stride))
         
         return valid_moves
     
     def _is_board_empty(self, board: Board) -> bool:
-        #Check if the board is empty (all cells are 0)
-        for row in board.matrix:
-            for cell in row:
-                if cell != 0:
-                    return False
-        return True
+        #Check if the board is empty (no stone of either colour)
+        return board.stone_count == 0
     
     def _has_neighbor(self, board: Board, row: int, col: int, distance: int = 2) -> bool:
         """
@@ -251,30 +814,58 @@ class AI:
         Returns:
             True if the cell has at least one neighbor, False otherwise
         """
-        for i in range(max(0, row - distance), min(self.board_size, row + distance + 1)):
-            for j in range(max(0, col - distance), min(self.board_size, col + distance + 1)):
-                if board.matrix[i][j] != 0:  # Non-empty cell
-                    return True
-        return False
+        return (board.neighbourhood(row, col, distance) & board.occupied) != 0
     
-    def _is_terminal_state(self, board: Board) -> bool:
+    def _is_terminal_state(self, board: Board, last_move: Optional[Tuple[int, int]] = None) -> bool:
         """
         Args:
             board: Current state of the board
+            last_move: Most recent move, if known only the lines through it can hold a new five
             
         Returns:
             True if game is over, False otherwise
         """
-        # Check if either player has won
-        for stone in [self.player_stone, self.opponent_stone]:
-            if self._check_win(board, stone):
+        if last_move is not None:
+            row, col = last_move
+            if self._is_winning_move(board, row, col):
                 return True
+        else:
+            # Check if either player has won
+            for stone in [self.player_stone, self.opponent_stone]:
+                if self._check_win(board, stone):
+                    return True
         
         # Check if board is full
-        for row in board.matrix:
-            if 0 in row:
-                return False
-        return True
+        return board.is_full()
+    
+    def _is_winning_move(self, board: Board, row: int, col: int) -> bool:
+        """
+        Same idea as Manager.__is_over: count the stones in a row through the move along each axis.
+        
+        Args:
+            board: Current state of the board
+            row: Row index of the stone just placed
+            col: Column index of the stone just placed
+            
+        Returns:
+            True if that stone is part of win_length (or more) in a row
+        """
+        size = board.size
+        cells = board.cells
+        stride = board.stride
+        stone = cells[row * stride + col]
+        
+        for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            count = 1  # the stone just placed
+            for sign in (1, -1):
+                r, c = row + dx * sign, col + dy * sign
+                while 0 <= r < size and 0 <= c < size and cells[r * stride + c] == stone:
+                    count += 1
+                    r += dx * sign
+                    c += dy * sign
+            if count >= self.win_length:
+                return True
+        return False
     
     def _check_win(self, board: Board, stone: int) -> bool:
         """
@@ -285,31 +876,8 @@ class AI:
         Returns:
             True if the player has won, False otherwise
         """
-        # Check horizontal
-        for i in range(self.board_size):
-            for j in range(self.board_size - self.win_length + 1):
-                if all(board.matrix[i][j+k] == stone for k in range(self.win_length)):
-                    return True
-        
-        # Check vertical
-        for i in range(self.board_size - self.win_length + 1):
-            for j in range(self.board_size):
-                if all(board.matrix[i+k][j] == stone for k in range(self.win_length)):
-                    return True
-        
-        # Check diagonal (top-left to bottom-right)
-        for i in range(self.board_size - self.win_length + 1):
-            for j in range(self.board_size - self.win_length + 1):
-                if all(board.matrix[i+k][j+k] == stone for k in range(self.win_length)):
-                    return True
-        
-        # Check diagonal (bottom-left to top-right)
-        for i in range(self.win_length - 1, self.board_size):
-            for j in range(self.board_size - self.win_length + 1):
-                if all(board.matrix[i-k][j+k] == stone for k in range(self.win_length)):
-                    return True
-        
-        return False
+        # Horizontal, vertical and both diagonals are all checked on the bitboard at once
+        return board.has_five(stone, self.win_length)
     
     def _evaluate_board(self, board: Board) -> float:
         """
@@ -319,17 +887,18 @@ class AI:
         Returns:
             Score for the current board state
         """
-        # Check if AI player has won
-        if self._check_win(board, self.player_stone):
+        # Check if AI player has won (the evaluator counts the lines with a five as it follows the
+        # board, no board scan needed)
+        if self.evaluator.has_five(board, self.player_stone):
             return float('inf')
         
         # Check if opponent has won
-        if self._check_win(board, self.opponent_stone):
+        if self.evaluator.has_five(board, self.opponent_stone):
             return float('-inf')
         
-        # Count patterns for both players
-        ai_score = self._count_patterns(board, self.player_stone)
-        opponent_score = self._count_patterns(board, self.opponent_stone)
+        # Pattern scores for both players (same as _count_patterns, kept up to date incrementally)
+        ai_score = self.evaluator.score(board, self.player_stone)
+        opponent_score = self.evaluator.score(board, self.opponent_stone)
         
         # Return the difference (positive is good for AI)
         return ai_score - opponent_score
@@ -343,80 +912,32 @@ class AI:
         Returns:
             Score based on the patterns found
         """
-        score = 0
-        directions = [(1, 0), (0, 1), (1, 1), (1, -1)]  # Horizontal, vertical, diagonal
-        
-        for i in range(self.board_size):
-            for j in range(self.board_size):
-                if board.matrix[i][j] != stone:
-                    continue
-                
-                # Check in all directions
-                for dx, dy in directions:
-                    score += self._check_pattern(board, i, j, dx, dy, stone)
+        # Every line from scratch, one table lookup for each line code seen before
+        return self.evaluator.board_score(board, stone)
+    
+    def count_patterns_batch(self, boards, stone: int):
+        """
+        Vectorized _count_patterns for many positions at once (needs NumPy).
         
-        return score
+        Args:
+            boards: (N, board_size, board_size) int8 array, see BatchEvaluator.boards_to_array
+            stone: Stone value to count patterns for
+            
+        Returns:
+            (N,) array of scores, equal to _count_patterns of each board
+        """
+        from AI.BatchEvaluator import BatchEvaluator
+        return BatchEvaluator(self.weights, self.win_length).count_patterns(boards, stone)
     
-    def _check_pattern(self, board: Board, row: int, col: int, dx: int, dy: int, stone: int) -> float:
+    def evaluate_boards(self, boards):
         """
+        Vectorized _evaluate_board for many positions at once (needs NumPy).
+        
         Args:
-            board: Current state of the board
-            row: Starting row
-            col: Starting column
-            dx: Row direction
-            dy: Column direction
-            stone: Stone value to check for
+            boards: (N, board_size, board_size) int8 array, see BatchEvaluator.boards_to_array
             
         Returns:
-            Score for the pattern found
-        """
-        # Check bounds
-        if not (0 <= row < self.board_size and 0 <= col < self.board_size):
-            return 0
-        
-        # Check if the current cell has the stone
-        if board.matrix[row][col] != stone:
-            return 0
-        
-        # Count consecutive stones
-        count = 1
-        r, c = row + dx, col + dy
-        
-        while 0 <= r < self.board_size and 0 <= c < self.board_size and board.matrix[r][c] == stone:
-            count += 1
-            r += dx
-            c += dy
-        
-        # Check if the pattern is open or blocked
-        is_open_start = False
-        is_open_end = False
-        
-        # Check if start is open
-        r_start, c_start = row - dx, col - dy
-        if 0 <= r_start < self.board_size and 0 <= c_start < self.board_size and board.matrix[r_start][c_start] == 0:
-            is_open_start = True
-        
-        # Check if end is open
-        if 0 <= r < self.board_size and 0 <= c < self.board_size and board.matrix[r][c] == 0:
-            is_open_end = True
-        
-        # Calculate score based on pattern
-        if count >= 5:
-            return self.weights['five']
-        elif count == 4:
-            if is_open_start and is_open_end:
-                return self.weights['open_four']
-            elif is_open_start or is_open_end:
-                return self.weights['four']
-        elif count == 3:
-            if is_open_start and is_open_end:
-                return self.weights['open_three']
-            elif is_open_start or is_open_end:
-                return self.weights['three']
-        elif count == 2:
-            if is_open_start and is_open_end:
-                return self.weights['open_two']
-            elif is_open_start or is_open_end:
-                return self.weights['two']
-        
-        return 0
\ No newline at end of file
+            (N,) array of scores, equal to _evaluate_board of each board
+        """
+        from AI.BatchEvaluator import BatchEvaluator
+        return BatchEvaluator(self.weights, self.win_length).evaluate(boards, self.player_stone, self.opponent_stone)
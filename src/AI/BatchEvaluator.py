@@ -0,0 +1,216 @@
+from functools import lru_cache
+from typing import Dict, Iterable
+import numpy as np
+from Engine.Board import Board
+from AI.PatternTable import window_table
+
+# Needs NumPy, unlike the rest of the engine. Meant for scoring many positions at once
+# (offline analysis, weight tuning), one board at a time AI._evaluate_board is cheaper.
+
+# Distinct lines scored per NumPy pass, every line compares all its windows with each other
+_LINE_CHUNK = 8192
+
+# Cells of a line packed into one 64 bit word of its key, two bits each (-1 to 2 shifted up by one)
+_CELLS_PER_WORD = 32
+
+# Shape names of the window table, as indices into the weight vector of a call
+_SHAPE_NAMES = ('five', 'open_four', 'four', 'open_three', 'three', 'open_two', 'two')
+
+# Cell values of a line seen by one colour, as in PatternTable
+_EMPTY, _OWN, _BLOCKED = 0, 1, 2
+
+
+def boards_to_array(boards: Iterable[Board]) -> np.ndarray:
+    """
+    Args:
+        boards: Boards of the same size
+
+    Returns:
+        (N, size, size) int8 array of the positions
+    """
+    return np.array([board.matrix for board in boards], dtype=np.int8)
+
+
+@lru_cache(maxsize=None)
+def _line_layout(size: int):
+    # The lines of a Board as a (lines, longest line) array of flat cell indices into a size * size
+    # board with one extra cell (index size * size) past the end of every shorter line. Lines are
+    # compared by their cells, never as one base-3 number, which would not fit an integer on
+    # large boards (3 ** 20 is past int32 already)
+    board = Board(size)
+    lengths = board.line_lengths
+    positions = {3 ** position: position for position in range(max(lengths))}
+    index = np.full((len(lengths), max(lengths)), size * size, dtype=np.intp)
+    for idx, lines in enumerate(board.cell_lines):
+        row, col = divmod(idx, board.stride)
+        for line, power in lines:
+            index[line, positions[power]] = row * size + col
+    return index
+
+
+@lru_cache(maxsize=None)
+def _window_arrays(win_length: int):
+    # PatternTable.window_table as arrays: shape index into _SHAPE_NAMES (-1 for no shape) and
+    # own stones bitmask of every window code
+    table = window_table(win_length)
+    shapes = np.array([-1 if entry is None else _SHAPE_NAMES.index(entry[0]) for entry in table], dtype=np.intp)
+    masks = np.array([0 if entry is None else entry[1] for entry in table], dtype=np.int64)
+    return shapes, masks
+
+
+class BatchEvaluator:
+    def __init__(self, weights: Dict[str, float], win_length: int = 5):
+        """
+        Vectorized version of AI._count_patterns / AI._evaluate_board over a stack of boards.
+        The lines of every board are gathered in one NumPy pass, and each distinct line is
+        scored once, all of them together, window by window with the same window
+        table as PatternTable.line_score, so the scores are exactly the ones of the per-board
+        evaluation.
+
+        Args:
+            weights: Pattern weights (same dictionary semantics as AI.weights)
+            win_length: Number of stones in a row needed to win
+        """
+        self.weights = weights
+        self.win_length = win_length
+
+    def count_patterns(self, boards: np.ndarray, stone: int) -> np.ndarray:
+        """
+        Args:
+            boards: (N, size, size) int8 array, 0 empty, 1 black, 2 white
+            stone: Stone value to count patterns for
+
+        Returns:
+            (N,) float64 array of pattern scores
+        """
+        scores, _ = self._line_totals(boards)
+        return scores[:, stone - 1]
+
+    def evaluate(self, boards: np.ndarray, player_stone: int, opponent_stone: int) -> np.ndarray:
+        """
+        Args:
+            boards: (N, size, size) int8 array, 0 empty, 1 black, 2 white
+            player_stone: Stone value the scores are for
+            opponent_stone: Stone value of the opponent
+
+        Returns:
+            (N,) float64 array, inf where the player has won, -inf where the opponent has
+            (the player's win is checked first, as in AI._evaluate_board)
+        """
+        scores, fives = self._line_totals(boards)
+        result = scores[:, player_stone - 1] - scores[:, opponent_stone - 1]
+        result[fives[:, opponent_stone - 1]] = float('-inf')
+        result[fives[:, player_stone - 1]] = float('inf')
+        return result
+
+    def _line_totals(self, boards: np.ndarray):
+        """
+        Args:
+            boards: (N, size, size) int8 array
+
+        Returns:
+            (N, 2) float64 array of the black and white pattern scores and (N, 2) bool array of
+            whether black / white has five in a row
+        """
+        if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+            raise ValueError(f"expected an (N, size, size) array of boards, got shape {boards.shape}")
+        size = boards.shape[1]
+        index = _line_layout(size)
+
+        # One extra cell per board where the lines shorter than the longest end, it blocks every
+        # window like the edge of the board
+        flat = np.full((len(boards), size * size + 1), -1, dtype=np.int8)
+        flat[:, :-1] = boards.reshape(-1, size * size)
+        cells = flat[:, index].reshape(-1, index.shape[1])
+
+        # Most lines repeat across boards (empty ones above all), each distinct one is scored once.
+        # The key of a line packs its cells two bits each into as many 64 bit words as it needs
+        words = np.zeros((len(cells), -(-index.shape[1] // _CELLS_PER_WORD)), dtype=np.uint64)
+        for position in range(index.shape[1]):
+            word, shift = divmod(position, _CELLS_PER_WORD)
+            words[:, word] |= (cells[:, position] + 1).astype(np.uint64) << np.uint64(2 * shift)
+        keys = words[:, 0] if words.shape[1] == 1 else words.view(np.dtype((np.void, words.itemsize * words.shape[1]))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        line_scores = np.empty((len(first), 2), dtype=np.float64)
+        line_fives = np.empty((len(first), 2), dtype=bool)
+        for start in range(0, len(first), _LINE_CHUNK):
+            chunk = slice(start, start + _LINE_CHUNK)
+            lines = cells[first[chunk]]
+            for stone in (1, 2):
+                line_scores[chunk, stone - 1], line_fives[chunk, stone - 1] = self._score_lines(lines, stone)
+
+        inverse = inverse.reshape(len(boards), len(index))
+        return line_scores[inverse].sum(axis=1), line_fives[inverse].any(axis=1)
+
+    def _score_lines(self, cells: np.ndarray, stone: int):
+        """
+        PatternTable.line_score and has_five for many lines at once.
+
+        Args:
+            cells: (L, longest line) int8 array of the lines, -1 past the end of a line
+            stone: Stone value to score the lines for
+
+        Returns:
+            (L,) float64 array of the scores and (L,) bool array of whether the stone has five
+        """
+        win_length = self.win_length
+        width = win_length + 2
+        shapes, masks = _window_arrays(win_length)
+        weight_of = np.array([self.weights[name] for name in _SHAPE_NAMES] + [0], dtype=np.float64)
+
+        # The line as one colour sees it, with the edge blocking both ends
+        line = np.full((len(cells), cells.shape[1] + 2), _BLOCKED, dtype=np.int64)
+        line[:, 1:-1] = np.where(cells == stone, _OWN, np.where(cells == 0, _EMPTY, _BLOCKED))
+        windows = line.shape[1] - width + 1
+        code = np.zeros((len(cells), windows), dtype=np.int64)
+        for position in range(width):
+            code += line[:, position:position + windows] * 3 ** position
+        shape = shapes[code]
+        weight = weight_of[shape]
+        mask = masks[code] << np.arange(windows)
+        valid = weight > 0
+        scores = (weight * valid).sum(axis=1)
+
+        # A line with one shape or none is scored already, only lines with several have any to merge
+        several = np.flatnonzero(valid.sum(axis=1) > 1)
+        if len(several):
+            scores[several] = self._merge_shapes(weight[several], mask[several], valid[several])
+        return scores, (shape == 0).any(axis=1)
+
+    @staticmethod
+    def _merge_shapes(weight: np.ndarray, mask: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        The de-duplication of PatternTable.line_score, for many lines at once.
+
+        Args:
+            weight: (L, windows) float64 array of the weight of every window's shape
+            mask: (L, windows) int64 array of the own stones of every window, as bits of the line
+            valid: (L, windows) bool array of the windows holding a shape with a positive weight
+
+        Returns:
+            (L,) float64 array of the line scores
+        """
+        # The windows with a shape moved to the front, in line order, the empty tail cut off
+        front = np.argsort(~valid, axis=1, kind='stable')[:, :valid.sum(axis=1).max()]
+        weight = np.take_along_axis(weight, front, axis=1)
+        mask = np.take_along_axis(mask, front, axis=1)
+        valid = np.take_along_axis(valid, front, axis=1)
+        windows = weight.shape[1]
+
+        # Every group of stones counts once as its best shape: of the windows with the same
+        # stones, the best one (the first of equal ones) stands for them all ...
+        order = np.arange(windows)
+        earlier = order[None, :, None] < order[None, None, :]    # [j, i]: window j comes before window i
+        same = (mask[:, :, None] == mask[:, None, :]) & valid[:, :, None]
+        wj, wi = weight[:, :, None], weight[:, None, :]
+        kept = valid & ~(same & ((wj > wi) | ((wj == wi) & earlier))).any(axis=1)
+        seen = np.where(same, order[None, :, None], windows).min(axis=1)
+
+        # ... and a shape made only of stones of a stronger one (the three inside a four) is part
+        # of it. Groups are taken strongest first, ties in the order they were first seen
+        sj, si = seen[:, :, None], seen[:, None, :]
+        stronger = kept[:, :, None] & ((wj > wi) | ((wj == wi) & (sj < si)))
+        mj, mi = mask[:, :, None], mask[:, None, :]
+        inside = stronger & ((mj & mi) == mi) & (mj != mi)
+        counted = kept & ~inside.any(axis=1)
+        return (weight * counted).sum(axis=1)
@@ -0,0 +1,214 @@
+from typing import Dict, List, Tuple
+from Engine.Board import Board
+from AI.PatternTable import PatternTable
+
+
+class Evaluator:
+    # Line scores are memoized by (length, code); the memo is dropped when it grows past this
+    CACHE_LIMIT = 1 << 18
+
+    # Memos by weights, shared by every Evaluator in the process (each AI has its own Evaluator)
+    _memos = {}
+
+    def __init__(self, weights: Dict[str, float], win_length: int = 5):
+        """
+        Keeps the pattern score of every line of a board for both colours and a running total,
+        so that after a move only the four lines through the changed cell are rescored.
+        Lines are scored with a PatternTable and memoized by their base-3 code, so a line seen
+        before costs one lookup. Scores are the same as AI._count_patterns. The lines holding
+        a five are counted the same way, so whether a colour has won is O(1) as well.
+
+        Args:
+            weights: Pattern weights (shared with the AI, changes are picked up on the next attach)
+            win_length: Number of stones in a row needed to win
+        """
+        self.weights = weights
+        self.win_length = win_length
+        self.patterns = PatternTable(weights, win_length)
+        self._cache = {}
+        self._weights_seen = None
+
+        self._board = None
+        self._hash = None
+        self.line_scores = []
+        self.totals = [0, 0, 0]
+        self.fives = [0, 0, 0]     # lines with win_length or more in a row, by stone
+
+    def attach(self, board: Board):
+        """
+        Scores every line of the board from scratch, needed once before update can be used.
+
+        Args:
+            board: Board to follow
+        """
+        self._sync_weights()
+        self._board = board
+        self.totals = [0, 0, 0]
+        self.fives = [0, 0, 0]
+        self.line_scores = []
+        for line, length in enumerate(board.line_lengths):
+            scores = self._line_score(length, board.line_codes[line])
+            self.line_scores.append(scores)
+            self.totals[1] += scores[0]
+            self.totals[2] += scores[1]
+            self.fives[1] += scores[2]
+            self.fives[2] += scores[3]
+        self._hash = board.hash
+
+    def update(self, board: Board, row: int, col: int, stone: int):
+        """
+        Rescores the four lines through a cell after make_move / unmake_move on it.
+
+        Args:
+            board: Board that was changed
+            row: Row index of the changed cell
+            col: Column index of the changed cell
+            stone: Stone value that was placed or removed
+        """
+        idx = row * board.stride + col
+        # Only a board that was followed up to the position before this move can be updated
+        if board is not self._board or board.hash ^ board.zobrist_keys[stone][idx] != self._hash:
+            self.attach(board)
+            return
+
+        line_scores = self.line_scores
+        totals = self.totals
+        fives = self.fives
+        codes = board.line_codes
+        lengths = board.line_lengths
+        for line, _ in board.cell_lines[idx]:
+            old_black, old_white, old_black_five, old_white_five = line_scores[line]
+            scores = self._line_score(lengths[line], codes[line])
+            line_scores[line] = scores
+            totals[1] += scores[0] - old_black
+            totals[2] += scores[1] - old_white
+            fives[1] += scores[2] - old_black_five
+            fives[2] += scores[3] - old_white_five
+        self._hash = board.hash
+
+    def score(self, board: Board, stone: int) -> float:
+        """
+        Args:
+            board: Current state of the board
+            stone: Stone value to get the pattern score for
+
+        Returns:
+            Score based on the patterns found, O(1) while the board is followed move by move
+        """
+        if board is not self._board or board.hash != self._hash:
+            self.attach(board)
+        return self.totals[stone]
+
+    def has_five(self, board: Board, stone: int) -> bool:
+        """
+        Args:
+            board: Current state of the board
+            stone: Stone value to check for win_length in a row
+
+        Returns:
+            True if the stone has won, O(1) while the board is followed move by move
+        """
+        if board is not self._board or board.hash != self._hash:
+            self.attach(board)
+        return self.fives[stone] > 0
+
+    def board_score(self, board: Board, stone: int) -> float:
+        # The same total as score, summed over every line from scratch
+        self._sync_weights()
+        index = stone - 1
+        total = 0
+        for length, code in zip(board.line_lengths, board.line_codes):
+            if code:    # an empty line scores nothing
+                total += self._line_score(length, code)[index]
+        return total
+
+    def threat_score(self, board: Board, idx: int) -> float:
+        """
+        Args:
+            board: Current state of the board
+            idx: Cell index of an empty cell
+
+        Returns:
+            Score of the shapes a black stone and a white stone placed on the cell would make
+            along the four lines through it, added up. Memoized by line code like the line scores.
+        """
+        cache = self._cache
+        lengths = board.line_lengths
+        codes = board.line_codes
+        score = 0
+        for line, power in board.cell_lines[idx]:
+            key = (lengths[line], codes[line], power)
+            placed = cache.get(key)
+            if placed is None:
+                if len(cache) >= self.CACHE_LIMIT:
+                    cache.clear()
+                placed = self._placement_score(*key)
+                cache[key] = placed
+            score += placed
+        return score
+
+    def shape_score(self, count: int, open_ends: int) -> float:
+        # A line that cannot grow to five is worth nothing
+        if count >= self.win_length:
+            return self.weights['five']
+        if open_ends == 0:
+            return 0
+        if count == 4:
+            return self.weights['open_four'] if open_ends == 2 else self.weights['four']
+        if count == 3:
+            return self.weights['open_three'] if open_ends == 2 else self.weights['three']
+        if count == 2:
+            return self.weights['open_two'] if open_ends == 2 else self.weights['two']
+        return 0
+
+    @staticmethod
+    def decode_line(length: int, code: int) -> List[int]:
+        # Cell values along the line, first cell in the lowest base-3 digit
+        cells = []
+        for _ in range(length):
+            code, cell = divmod(code, 3)
+            cells.append(cell)
+        return cells
+
+    def _sync_weights(self):
+        # Memoized scores are only good for the weights they were computed with
+        weights_now = tuple(self.weights.items())
+        if weights_now != self._weights_seen:
+            self._cache = Evaluator._memos.setdefault(weights_now, {})
+            self._weights_seen = weights_now
+
+    def _placement_score(self, length: int, code: int, power: int) -> float:
+        # Both colours' shape_score of a stone at the cell 3 ** position of the line: the run of
+        # stones it joins and whether the cells past both ends are empty
+        cells = self.decode_line(length, code)
+        position = 0
+        while power > 1:
+            power //= 3
+            position += 1
+        score = 0
+        for stone in (1, 2):
+            count = 1
+            open_ends = 0
+            for step in (1, -1):
+                i = position + step
+                while 0 <= i < length and cells[i] == stone:
+                    count += 1
+                    i += step
+                if 0 <= i < length and cells[i] == 0:
+                    open_ends += 1
+            score += self.shape_score(count, open_ends)
+        return score
+
+    def _line_score(self, length: int, code: int) -> Tuple[float, float, int, int]:
+        # Black and white pattern scores of the line, and 1 / 0 for whether black / white has a five on it
+        key = (length, code)
+        scores = self._cache.get(key)
+        if scores is None:
+            if len(self._cache) >= self.CACHE_LIMIT:
+                self._cache.clear()
+            cells = self.decode_line(length, code)
+            patterns = self.patterns
+            scores = (patterns.line_score(cells, 1), patterns.line_score(cells, 2),
+                      int(patterns.has_five(cells, 1)), int(patterns.has_five(cells, 2)))
+            self._cache[key] = scores
+        return scores
@@ -0,0 +1,396 @@
+import math
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+from Engine.Board import Board
+from Engine.SparseBoard import SparseBoard
+from AI.AI import AI
+from AI.Evaluator import Evaluator
+from AI.ThreatSearch import ThreatSearch, SearchTimeout
+
+# Monte Carlo tree search, an alternative to the alpha-beta AI with the same move contract. It is
+# anytime: stopped after any number of playouts (time budget, playout budget or cancelled) it
+# returns the most visited move so far, so the time a move takes is whatever it is given.
+# Needs NumPy, unlike the rest of the engine: playouts run in batches, all the playouts of a
+# batch advancing one move per step on a stack of int8 boards.
+
+# Cell value of the padding around the playout boards, neither a stone nor empty
+_OFF_BOARD = 3
+
+# One direction of every line axis, and the eight neighbours of a cell
+_AXES = ((1, 0), (0, 1), (1, 1), (1, -1))
+_NEIGHBOURS = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc)
+
+
+class _Node:
+    __slots__ = ('move', 'stone', 'parent', 'prior', 'children', 'visits', 'value', 'result')
+
+    def __init__(self, move: Optional[Tuple[int, int]], stone: int, parent: Optional['_Node'], prior: float):
+        # Results are from the point of view of the player who made the move (stone)
+        self.move = move
+        self.stone = stone
+        self.parent = parent
+        self.prior = prior
+        self.children = None    # None until expanded
+        self.visits = 0
+        self.value = 0.0        # Sum of the results, 1 a win, 0.5 a draw, 0 a loss
+        self.result = None      # The result if the move ends the game
+
+
+class MCTS:
+    # PUCT exploration constant, how much the prior and a low visit count weigh against the mean result
+    EXPLORATION = 1.5
+
+    # Added to every move's threat score before the scores are made into priors, so quiet moves keep some
+    PRIOR_BASE = 50
+
+    # Playouts a leaf gets before its children are created
+    EXPAND_VISITS = 1
+
+    # Cells kept around the stones of a sparse board
+    WINDOW_MARGIN = 8
+
+    def __init__(self, player_stone: int = 2, opponent_stone: int = 1, win_length: int = 5,
+                 time_limit_ms: Optional[float] = 1000, iterations: Optional[int] = None, batch_size: int = 64,
+                 playout_moves: Optional[int] = None, tactical_playouts: bool = True, threat_depth: int = 8,
+                 weights: Optional[Dict[str, float]] = None, seed: Optional[int] = None):
+        """
+        Args:
+            player_stone: Stone value for the AI player (typically 1 or 2)
+            opponent_stone: Stone value for the opponent (typically 2 or 1)
+            win_length: Number of stones in a row needed to win (typically 5)
+            time_limit_ms: Default wall-clock budget per move, None for no time limit
+            iterations: Default playout budget per move, None for no limit (one of the two is needed)
+            batch_size: Playouts run at once, bigger batches make each playout cheaper but the
+                tree is updated less often (and the time limit is only checked between batches)
+            playout_moves: Moves a playout makes at most before it counts as a draw (defaults to
+                filling the board)
+            tactical_playouts: Playouts complete a five and block the opponent's when they can,
+                instead of playing at random next to the stones everywhere
+            threat_depth: Maximum attacker moves of the forced wins looked for before searching (0 turns it off)
+            weights: Pattern weights of the move priors (defaults to AI.WEIGHTS)
+            seed: Seed of the playouts, for repeatable searches
+        """
+        self.player_stone = player_stone
+        self.opponent_stone = opponent_stone
+        self.win_length = win_length
+        self.time_limit_ms = time_limit_ms
+        self.iterations = iterations
+        self.batch_size = batch_size
+        self.playout_moves = playout_moves
+        self.tactical_playouts = tactical_playouts
+        self.threat_depth = threat_depth
+        self.weights = dict(weights or AI.WEIGHTS)
+
+        # Set from another thread to stop the running search, the best move so far is returned.
+        # Whoever sets it clears it.
+        self.cancelled = False
+
+        # Playouts run since this engine was created (the counterpart of AI.nodes), and of the last move
+        self.nodes = 0
+        self.last_playouts = 0
+
+        self.evaluator = Evaluator(self.weights, win_length)
+        self.threat_search = ThreatSearch(win_length, should_stop=self._should_stop)
+        self._deadline = None
+        self._rng = np.random.default_rng(seed)
+
+        # Tree of the last search, kept for the next move if the game went on from it
+        self._root = None
+        self._root_history = ()
+
+    def ai_move(self, board: Board, time_limit_ms: Optional[float] = None, iterations: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Args:
+            board: Current state of the board
+            time_limit_ms: Wall-clock budget for this move (defaults to self.time_limit_ms)
+            iterations: Playout budget for this move (defaults to self.iterations)
+
+        Returns:
+            Tuple of (row, col) for the best move
+        """
+        if isinstance(board, SparseBoard):
+            view, rows, cols = board.window(self.WINDOW_MARGIN)
+            row, col = self.ai_move(view, time_limit_ms, iterations)
+            return rows[row], cols[col]
+
+        start = time.perf_counter()
+        self.last_playouts = 0
+        if board.stone_count == 0:
+            center = board.size // 2
+            return (center, center)
+
+        time_limit_ms = time_limit_ms if time_limit_ms is not None else self.time_limit_ms
+        iterations = iterations if iterations is not None else self.iterations
+        if time_limit_ms is None and iterations is None:
+            raise ValueError("MCTS needs a time limit or an iteration budget")
+        deadline = start + time_limit_ms / 1000 if time_limit_ms is not None else None
+
+        # A forced win (or the only defence against one) needs no search. The solver runs on the
+        # move's clock, once that is out the tree search below is skipped and the best prior played
+        if self.threat_depth > 0:
+            self._deadline = deadline
+            try:
+                line = self.threat_search.find_win(board, self.player_stone, self.threat_depth)
+                if line is not None:
+                    return line[0]
+                defence = self.threat_search.find_defence(board, self.player_stone, self.threat_depth)
+                if defence is not None:
+                    return defence
+            except SearchTimeout:
+                pass
+            finally:
+                self._deadline = None
+
+        root = self._reuse_root(board)
+        if root.children is None:
+            self._expand(root, board)
+        if len(root.children) == 1:
+            return root.children[0].move
+
+        base = self._to_array(board)
+        while not self.cancelled:
+            if iterations is not None and self.last_playouts >= iterations:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            count = self.batch_size if iterations is None else min(self.batch_size, iterations - self.last_playouts)
+            self._run_batch(board, root, base, count)
+            self.last_playouts += count
+            self.nodes += count
+
+        self._root = root
+        self._root_history = tuple(board.history)
+        return self.best_move(root)
+
+    @staticmethod
+    def best_move(root: _Node) -> Tuple[int, int]:
+        # The most visited move, the mean result and then the prior break ties
+        return max(root.children, key=lambda child: (child.visits, child.value / child.visits if child.visits else 0,
+                                                     child.prior)).move
+
+    def _should_stop(self) -> bool:
+        return self.cancelled or (self._deadline is not None and time.perf_counter() >= self._deadline)
+
+    def _reuse_root(self, board: Board) -> _Node:
+        # The subtree of the position now on the board, if the last search's tree reached it
+        history = board.history
+        known = len(self._root_history)
+        node = self._root
+        if node is not None and len(history) >= known and tuple(history[:known]) == self._root_history:
+            for row, col, _ in history[known:]:
+                node = next((child for child in node.children or () if child.move == (row, col)), None)
+                if node is None:
+                    break
+            if node is not None and node.stone == self.opponent_stone:
+                node.parent = None
+                return node
+        return _Node(None, self.opponent_stone, None, 1.0)
+
+    def _run_batch(self, board: Board, root: _Node, base: np.ndarray, count: int):
+        """
+        Selects count leaves (a visit is counted on the way down, so later selections of the batch
+        avoid the paths already taken), runs their playouts together and backs the results up.
+
+        Args:
+            board: Position of the root, moved along the selected paths and back
+            root: Root of the tree
+            base: The root position as a (size, size) int8 array
+            count: Playouts to run
+        """
+        leaves = []
+        placed = []     # (leaf number, row, col, stone) of the moves between the root and every leaf
+        for _ in range(count):
+            node = root
+            depth = 0
+            while True:
+                node.visits += 1
+                if node.result is not None or node.children is None:
+                    break
+                node = self._select(node)
+                board.make_move(node.move[0], node.move[1], node.stone)
+                depth += 1
+                if node.visits == 0:
+                    # First time here, the move may have ended the game
+                    if board.has_five(node.stone, self.win_length):
+                        node.result = 1.0
+                    elif board.is_full():
+                        node.result = 0.5
+
+            if node.result is not None:
+                self._backup(node, node.result)
+            else:
+                if node.visits > self.EXPAND_VISITS:
+                    self._expand(node, board)
+                number = len(leaves)
+                leaves.append(node)
+                placed.extend((number, row, col, stone) for row, col, stone in board.history[len(board.history) - depth:])
+            for _ in range(depth):
+                board.unmake_move()
+
+        if not leaves:
+            return
+        boards = np.repeat(base[None], len(leaves), axis=0)
+        if placed:
+            numbers, rows, cols, stones = np.array(placed, dtype=np.intp).T
+            boards[numbers, rows, cols] = stones
+        to_move = np.array([3 - leaf.stone for leaf in leaves], dtype=np.int8)
+        winners = self._playouts(boards, to_move)
+        for leaf, winner in zip(leaves, winners.tolist()):
+            self._backup(leaf, 0.5 if winner == 0 else float(winner == leaf.stone))
+
+    def _select(self, node: _Node) -> _Node:
+        # PUCT: mean result plus a bonus for a high prior and few visits. Moves not tried yet are
+        # valued at the parent's result seen from their side
+        scale = self.EXPLORATION * math.sqrt(node.visits)
+        first_play = 1 - node.value / node.visits if node.visits else 0.5
+        best = None
+        best_score = float('-inf')
+        for child in node.children:
+            visits = child.visits
+            mean = child.value / visits if visits else first_play
+            score = mean + scale * child.prior / (1 + visits)
+            if score > best_score:
+                best_score = score
+                best = child
+        return best
+
+    def _backup(self, node: _Node, result: float):
+        # The visits were counted on the way down, only the result is added, flipped every ply
+        while node is not None:
+            node.value += result
+            result = 1 - result
+            node = node.parent
+
+    def _expand(self, node: _Node, board: Board):
+        """
+        Creates the children of a node, with priors from the threat scores of their moves.
+
+        Args:
+            node: Node of the position on the board
+            board: Current state of the board
+        """
+        stone = 3 - node.stone
+        stride = board.stride
+        threats = self.threat_search
+        # A five ends the game and the opponent's five has to be stopped, nothing else is worth a visit
+        cells = threats.five_cells(board, stone) or threats.five_cells(board, 3 - stone)
+        if not cells:
+            cells = board.candidates or board.full_mask & ~board.occupied
+
+        moves = [divmod(idx, stride) for idx in Board.bit_indices(cells)]
+        scores = [self.evaluator.threat_score(board, row * stride + col) + self.PRIOR_BASE for row, col in moves]
+        total = sum(scores)
+        node.children = [_Node(move, stone, node, score / total) for move, score in zip(moves, scores)]
+
+    @staticmethod
+    def _to_array(board: Board) -> np.ndarray:
+        return np.array(board.matrix, dtype=np.int8)
+
+    def _playouts(self, boards: np.ndarray, to_move: np.ndarray) -> np.ndarray:
+        """
+        Plays every position out to the end, one move of all the unfinished games per step.
+
+        Args:
+            boards: (N, size, size) int8 array of the positions, changed in place
+            to_move: (N,) stone values of the side to move in each
+
+        Returns:
+            (N,) int8 array of the winners, 0 for a draw
+        """
+        count, size = boards.shape[0], boards.shape[1]
+        pad = self.win_length - 1
+        padded = np.full((count, size + 2 * pad, size + 2 * pad), _OFF_BOARD, dtype=np.int8)
+        padded[:, pad:pad + size, pad:pad + size] = boards
+        winners = np.zeros(count, dtype=np.int8)
+        games = np.arange(count)
+        to_move = to_move.copy()
+
+        for _ in range(self.playout_moves or size * size):
+            inner = padded[:, pad:pad + size, pad:pad + size]
+            empty = inner == 0
+            stones = padded != 0
+            stones &= padded != _OFF_BOARD
+            near = np.zeros_like(empty)
+            for dr, dc in _NEIGHBOURS:
+                near |= stones[:, pad + dr:pad + dr + size, pad + dc:pad + dc + size]
+            near &= empty
+
+            # A random cell next to a stone, or any empty one if there is none
+            key = self._rng.random(empty.shape, dtype=np.float32)
+            key += near
+            if self.tactical_playouts:
+                mover = to_move[:, None, None]
+                # Winning comes first, then stopping the opponent's five
+                key += 4 * self._five_cells(padded == mover, empty, pad)
+                key += 2 * self._five_cells(padded == 3 - mover, empty, pad)
+            key[~empty] = -1
+            flat = key.reshape(len(games), -1)
+            cells = flat.argmax(axis=1)
+            moved = flat[np.arange(len(games)), cells] >= 0
+
+            rows, cols = np.divmod(cells, size)
+            rows += pad
+            cols += pad
+            playing = np.flatnonzero(moved)
+            padded[playing, rows[playing], cols[playing]] = to_move[playing]
+            won = moved & self._wins_at(padded, rows, cols, to_move)
+            winners[games[won]] = to_move[won]
+
+            # Finished games (a five or a full board) leave the batch
+            going = moved & ~won
+            if not going.any():
+                break
+            if not going.all():
+                padded, games, to_move = padded[going], games[going], to_move[going]
+            to_move = 3 - to_move
+        return winners
+
+    def _wins_at(self, padded: np.ndarray, rows: np.ndarray, cols: np.ndarray, stones: np.ndarray) -> np.ndarray:
+        """
+        Same idea as Manager.__is_over, for a whole batch: count the stones in a row through the
+        last move along each axis.
+
+        Args:
+            padded: (N, size + 2 * pad, size + 2 * pad) boards with win_length - 1 cells of padding
+            rows: (N,) padded row indices of the last moves
+            cols: (N,) padded column indices of the last moves
+            stones: (N,) stone values of the last moves
+
+        Returns:
+            (N,) bool array, True where the last move made win_length (or more) in a row
+        """
+        games = np.arange(len(rows))
+        won = np.zeros(len(rows), dtype=bool)
+        for dr, dc in _AXES:
+            count = np.ones(len(rows), dtype=np.int8)   # the stone just placed
+            for sign in (1, -1):
+                running = np.ones(len(rows), dtype=bool)
+                for step in range(1, self.win_length):
+                    running &= padded[games, rows + sign * step * dr, cols + sign * step * dc] == stones
+                    count += running
+            won |= count >= self.win_length
+        return won
+
+    def _five_cells(self, own: np.ndarray, empty: np.ndarray, pad: int) -> np.ndarray:
+        """
+        Args:
+            own: (N, size + 2 * pad, size + 2 * pad) bool array of one side's stones on the padded boards
+            empty: (N, size, size) bool array of the empty cells
+            pad: Padding width (win_length - 1)
+
+        Returns:
+            (N, size, size) bool array of the empty cells where a stone would make win_length in a row
+        """
+        size = empty.shape[1]
+        cells = np.zeros_like(empty)
+        for dr, dc in _AXES:
+            count = np.zeros(empty.shape, dtype=np.int8)
+            for sign in (1, -1):
+                running = np.ones_like(empty)
+                for step in range(1, self.win_length):
+                    row, col = pad + sign * step * dr, pad + sign * step * dc
+                    running &= own[:, row:row + size, col:col + size]
+                    count += running
+            cells |= count >= self.win_length - 1
+        return cells & empty
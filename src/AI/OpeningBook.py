@@ -0,0 +1,140 @@
+import mmap
+import struct
+from typing import Dict, Optional, Tuple
+from Engine.Board import Board
+
+# On-disk opening book: an open addressing hash table that is memory-mapped and probed in place,
+# so opening it costs nothing and every process shares the same pages.
+#
+#   header: magic, version, board size, number of slots (a power of two)
+#   slots:  64-bit key, 16-bit cell index of the move (row * size + col), 8-bit search depth, padding
+#
+# Keys are the smallest Zobrist hash over the 8 symmetries of the board (plus the side to move),
+# so one entry serves every rotated / mirrored copy of a position. Key 0 marks an empty slot.
+
+_HEADER = struct.Struct('<4sHHI')
+_SLOT = struct.Struct('<QHBx')
+_MAGIC = b'GMKB'
+_VERSION = 1
+
+
+def _symmetries(size: int):
+    # The 8 ways to rotate / mirror a square board, as functions of (row, col)
+    n = size - 1
+    return (
+        lambda r, c: (r, c),
+        lambda r, c: (c, n - r),
+        lambda r, c: (n - r, n - c),
+        lambda r, c: (n - c, r),
+        lambda r, c: (r, n - c),
+        lambda r, c: (c, r),
+        lambda r, c: (n - r, c),
+        lambda r, c: (n - c, n - r),
+    )
+
+
+def canonical_key(board: Board, stone_to_move: int) -> Tuple[int, int]:
+    """
+    Args:
+        board: Position to look up
+        stone_to_move: Stone value of the player the move is for
+
+    Returns:
+        Tuple of (canonical key, index of the symmetry that maps the board onto the canonical position)
+    """
+    keys = board.zobrist_keys
+    stride = board.stride
+    best_key, best_symmetry = None, 0
+    for symmetry, transform in enumerate(_symmetries(board.size)):
+        key = board.side_keys[stone_to_move]
+        for row, col, stone in board.history:
+            r, c = transform(row, col)
+            key ^= keys[stone][r * stride + c]
+        key = key or 1   # 0 is reserved for empty slots
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+def to_canonical(size: int, symmetry: int, move: Tuple[int, int]) -> Tuple[int, int]:
+    return _symmetries(size)[symmetry](*move)
+
+
+def from_canonical(size: int, symmetry: int, move: Tuple[int, int]) -> Tuple[int, int]:
+    # The inverse is the symmetry that, followed by this one, leaves three corner cells in place
+    transform = _symmetries(size)[symmetry]
+    probes = ((0, 0), (0, 1), (1, 0))
+    for candidate in _symmetries(size):
+        if all(transform(*candidate(*cell)) == cell for cell in probes):
+            return candidate(*move)
+    raise ValueError(f"no inverse for symmetry {symmetry}")
+
+
+def write_book(path: str, entries: Dict[int, Tuple[Tuple[int, int], int]], board_size: int = Board.DIMENSIONS):
+    """
+    Args:
+        path: File to write
+        entries: Canonical key -> (move in the canonical orientation, search depth)
+        board_size: Size of the board the keys were computed for
+    """
+    slots = 1
+    while slots < 2 * max(1, len(entries)):   # keep the load factor at or below one half
+        slots <<= 1
+    mask = slots - 1
+
+    table = bytearray(_SLOT.size * slots)
+    for key, ((row, col), depth) in entries.items():
+        slot = key & mask
+        while struct.unpack_from('<Q', table, slot * _SLOT.size)[0] != 0:
+            slot = (slot + 1) & mask
+        _SLOT.pack_into(table, slot * _SLOT.size, key, row * board_size + col, min(depth, 255))
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, board_size, slots))
+        file.write(table)
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Book file written by write_book (see Tools/BuildOpeningBook.py)
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.board_size, self.slots = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {_VERSION} opening book")
+        self._mask = self.slots - 1
+
+    def lookup(self, board: Board, stone_to_move: int) -> Optional[Tuple[int, int]]:
+        """
+        Args:
+            board: Current state of the board
+            stone_to_move: Stone value of the player to move
+
+        Returns:
+            Book move as (row, col) in the board's own orientation, None if the position is not in the book
+        """
+        if board.size != self.board_size:
+            return None
+        key, symmetry = canonical_key(board, stone_to_move)
+        slot = key & self._mask
+        while True:
+            stored_key, cell, _ = _SLOT.unpack_from(self._map, _HEADER.size + slot * _SLOT.size)
+            if stored_key == 0:
+                return None
+            if stored_key == key:
+                return from_canonical(self.board_size, symmetry, divmod(cell, self.board_size))
+            slot = (slot + 1) & self._mask
+
+    def __len__(self):
+        count = 0
+        for slot in range(self.slots):
+            if _SLOT.unpack_from(self._map, _HEADER.size + slot * _SLOT.size)[0] != 0:
+                count += 1
+        return count
+
+    def close(self):
+        self._map.close()
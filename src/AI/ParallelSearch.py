@@ -0,0 +1,178 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from Engine.Board import Board
+from Engine.SparseBoard import SparseBoard
+from AI.AI import AI
+
+# Root-parallel alpha-beta: the root moves are shared out over a pool of processes, every worker
+# has its own AI (and transposition table) and all of them read and raise one shared alpha bound.
+
+# Per worker process state, set up by _init_worker
+_worker_ai = None
+_shared_alpha = None
+_worker_search = None   # number of the root search the worker last took a job of
+
+
+def _init_worker(config: Dict, weights: Dict[str, float], shared_alpha):
+    global _worker_ai, _shared_alpha
+    _worker_ai = AI(**config)
+    _worker_ai.weights.update(weights)
+    _shared_alpha = shared_alpha
+
+
+def _search_move(size: int, history: List[Tuple[int, int, int]], move: Tuple[int, int], depth: int,
+                 search: int) -> Tuple[float, float]:
+    """
+    Args:
+        size: Size of the board
+        history: Moves of the root position as (row, col, stone)
+        move: Root move to score
+        depth: Depth of the root search
+        search: Number of the root search the move belongs to (the main AI's table generation)
+
+    Returns:
+        Tuple of (score, alpha it was searched with), the score is exact only if above that alpha
+    """
+    global _worker_search
+    board = Board(size)
+    for row, col, stone in history:
+        board.make_move(row, col, stone)
+
+    # Just below the shared bound, so a move that only ties the best one so far is still scored
+    # exactly and ties can be broken by root order like the serial search does
+    alpha = math.nextafter(_shared_alpha.value, float('-inf'))
+    # The first job of a new root search starts a search in the worker too, like the serial path
+    # does, so the table generation advances and entries of earlier moves can be replaced
+    if search != _worker_search:
+        _worker_search = search
+        _worker_ai._new_search(board)
+    else:
+        _worker_ai._fit_history(board)
+    _worker_ai._begin_root(depth)
+    score = _worker_ai._search_root_move(board, move, depth, alpha)
+
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return score, alpha
+
+
+class ParallelSearch:
+    def __init__(self, ai: AI, workers: Optional[int] = None):
+        """
+        Args:
+            ai: AI whose settings (stones, depth, weights) the workers copy, it also orders the root moves
+            workers: Number of worker processes (defaults to the number of CPUs)
+        """
+        self.ai = ai
+        self.workers = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context()
+        self._shared_alpha = context.Value('d', float('-inf'))
+        config = {
+            'board_size': ai.board_size,
+            'win_length': ai.win_length,
+            'player_stone': ai.player_stone,
+            'opponent_stone': ai.opponent_stone,
+            'max_depth': ai.max_depth,
+            'tt_size': ai.tt.size,
+            'threat_depth': ai.threat_depth,
+            'use_vct': ai.use_vct,
+            'beam_width': ai.beam_width,
+            'lmr_moves': ai.lmr_moves,
+            'lmr_reduction': ai.lmr_reduction,
+        }
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(config, dict(ai.weights), self._shared_alpha))
+
+    def ai_move_with_pruning(self, board: Board, depth: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Same move as ai.ai_move_with_pruning, searched on all workers.
+
+        Args:
+            board: Current state of the board
+            depth: Depth to search to (defaults to ai.max_depth)
+
+        Returns:
+            Tuple of (row, col) for the best move
+        """
+        ai = self.ai
+        depth = depth or ai.max_depth
+        if isinstance(board, SparseBoard):
+            return ai._on_window(board, depth, lambda _, view: self.ai_move_with_pruning(view, depth))
+
+        book_move = ai._book_move(board)
+        if book_move is not None:
+            return book_move
+
+        valid_moves = ai._get_valid_moves(board)
+
+        if ai._is_board_empty(board):
+            center = board.size // 2
+            return (center, center)
+
+        if len(valid_moves) == 1:
+            return valid_moves[0]
+
+        threat_move = ai._threat_move(board)
+        if threat_move is not None:
+            return threat_move
+
+        ai._new_search(board)
+        key, stored = ai._prepare_root(board, valid_moves, depth)
+        if stored is not None:
+            return stored[0]
+
+        history = list(board.history)
+        self._shared_alpha.value = float('-inf')
+
+        # The first (best ordered) move is searched alone, so the others start with a useful bound
+        search = ai.tt.generation
+        first = self._executor.submit(_search_move, board.size, history, valid_moves[0], depth, search)
+        results = [first.result()]
+        futures = [self._executor.submit(_search_move, board.size, history, move, depth, search) for move in valid_moves[1:]]
+        results.extend(future.result() for future in futures)
+
+        # Pick like the serial root loop: the first move with the highest exact score
+        best_score = float('-inf')
+        best_move = valid_moves[0]
+        for move, (score, alpha) in zip(valid_moves, results):
+            if score > alpha and score > best_score:
+                best_score = score
+                best_move = move
+
+        ai._finish_root(board, key, depth, best_move, best_score)
+        return best_move
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Speedup over worker counts on a middlegame position, run from src/ with: python -m AI.ParallelSearch
+    import time
+
+    board = Board()
+    for row, col, stone in [(7, 7, 1), (7, 8, 2), (8, 8, 1), (6, 6, 2), (8, 6, 1), (9, 7, 2), (6, 8, 1), (8, 7, 2)]:
+        board.make_move(row, col, stone)
+
+    start = time.perf_counter()
+    serial_move = AI(max_depth=4).ai_move_with_pruning(board)
+    serial_time = time.perf_counter() - start
+    print(f"serial    move {serial_move} {serial_time:.2f}s")
+
+    for workers in (1, 2, 4, 8):
+        with ParallelSearch(AI(max_depth=4), workers) as search:
+            search.ai_move_with_pruning(board, depth=1)   # let the workers start up
+            start = time.perf_counter()
+            move = search.ai_move_with_pruning(board)
+            elapsed = time.perf_counter() - start
+        print(f"{workers} workers move {move} {elapsed:.2f}s speedup {serial_time / elapsed:.2f}x")
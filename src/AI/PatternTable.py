@@ -0,0 +1,139 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Shape scoring by table lookup. Every window of win_length cells along a line, seen together with
+# the cell before and after it, is one base-3 code (empty / own stone / blocked by the opponent or
+# the edge). The shape of every possible code is classified once, so scoring a line is a slide of
+# lookups. Broken shapes (XX_XX, X_XXX, _X_XX_, ...) are shapes like any other here.
+
+_EMPTY, _OWN, _BLOCKED = 0, 1, 2
+
+# Shapes by the number of own stones the window is short of win_length
+_SHAPES = {1: ('open_four', 'four'), 2: ('open_three', 'three'), 3: ('open_two', 'two')}
+
+
+def _has_straight_four(cells: List[int], win_length: int) -> bool:
+    # _XXXX_: win_length - 1 own stones in a row with both ends empty, it can be made five two ways
+    for start in range(len(cells) - win_length):
+        if (cells[start] == _EMPTY and cells[start + win_length] == _EMPTY
+                and all(cell == _OWN for cell in cells[start + 1:start + win_length])):
+            return True
+    return False
+
+
+def _becomes_straight_four(cells: List[int], win_length: int, moves: int) -> bool:
+    # Whether `moves` more stones on empty cells of the window make a straight four
+    if moves == 0:
+        return _has_straight_four(cells, win_length)
+    for position in range(1, win_length + 1):
+        if cells[position] == _EMPTY:
+            cells[position] = _OWN
+            found = _becomes_straight_four(cells, win_length, moves - 1)
+            cells[position] = _EMPTY
+            if found:
+                return True
+    return False
+
+
+def _classify(cells: List[int], win_length: int) -> Optional[Tuple[str, int]]:
+    """
+    Args:
+        cells: Cell before the window, the win_length window cells and the cell after it
+        win_length: Number of stones in a row needed to win
+
+    Returns:
+        Tuple of (weight name, bitmask of the own stones in the window), None if the window
+        holds no shape (too few stones, or it cannot become five)
+    """
+    window = cells[1:win_length + 1]
+    if _BLOCKED in window:
+        return None
+    stones = window.count(_OWN)
+    mask = sum(1 << position for position, cell in enumerate(window) if cell == _OWN)
+    if stones == win_length:
+        return 'five', mask
+    missing = win_length - stones
+    if missing not in _SHAPES:
+        return None
+    open_shape, closed_shape = _SHAPES[missing]
+    # Open: the missing stones but one can make a straight four, which cannot be stopped any more
+    if _becomes_straight_four(list(cells), win_length, missing - 1):
+        return open_shape, mask
+    return closed_shape, mask
+
+
+@lru_cache(maxsize=None)
+def window_table(win_length: int) -> Tuple[Optional[Tuple[str, int]], ...]:
+    # Indexed by sum(cell * 3 ** position) over the win_length + 2 cells, built once per win_length
+    width = win_length + 2
+    table = []
+    for code in range(3 ** width):
+        cells = []
+        for _ in range(width):
+            code, cell = divmod(code, 3)
+            cells.append(cell)
+        table.append(_classify(cells, win_length))
+    return tuple(table)
+
+
+class PatternTable:
+    def __init__(self, weights: Dict[str, float], win_length: int = 5):
+        """
+        Args:
+            weights: Pattern weights by shape name (shared with the AI, read on every call)
+            win_length: Number of stones in a row needed to win
+        """
+        self.weights = weights
+        self.win_length = win_length
+        self._table = window_table(win_length)
+
+    def line_score(self, cells: List[int], stone: int) -> float:
+        """
+        Args:
+            cells: Values of the cells along one line (0 empty, 1 black, 2 white)
+            stone: Stone value to score the line for
+
+        Returns:
+            Sum of the weights of the stone's shapes on the line, every group of stones counted
+            once as the best shape it forms
+        """
+        width = self.win_length + 2
+        if len(cells) < self.win_length:
+            return 0
+        line = [_BLOCKED] + [_OWN if cell == stone else _EMPTY if cell == 0 else _BLOCKED for cell in cells] + [_BLOCKED]
+
+        # The same stones show up in several overlapping windows, keep their best shape
+        weights = self.weights
+        table = self._table
+        top = 3 ** (width - 1)
+        shapes = {}
+        code = 0
+        for position in range(width - 1):
+            code += line[position] * 3 ** position
+        for start in range(len(line) - width + 1):
+            code += line[start + width - 1] * top
+            entry = table[code]
+            if entry is not None:
+                weight = weights[entry[0]]
+                mask = entry[1] << start
+                if weight > shapes.get(mask, 0):
+                    shapes[mask] = weight
+            code //= 3
+
+        # A weaker shape made only of stones of a stronger one (the three inside a four) is part of it
+        score = 0
+        kept = []
+        for mask, weight in sorted(shapes.items(), key=lambda item: item[1], reverse=True):
+            if any(mask & other == mask for other in kept):
+                continue
+            kept.append(mask)
+            score += weight
+        return score
+
+    def has_five(self, cells: List[int], stone: int) -> bool:
+        run = 0
+        for cell in cells:
+            run = run + 1 if cell == stone else 0
+            if run >= self.win_length:
+                return True
+        return False
@@ -0,0 +1,109 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+from Engine.Board import Board
+from AI.AI import AI
+from AI.SearchStats import SearchStats
+
+# Pondering: while the opponent thinks, a background thread plays their most likely replies on a
+# copy of the board and searches the AI's answer to each. The results stay keyed by position and
+# the AI's transposition table stays warm, so an expected reply is answered almost at once.
+# The thread shares the AI, which is safe because every AI move stops it first. What a search leaves
+# behind for the next one (the root score its aspiration window is centred on, the last stats and
+# depth) is put back when pondering ends, the real search must not start from a pondered position.
+
+
+class Ponderer:
+    def __init__(self, ai: AI, replies: int = 4):
+        """
+        Args:
+            ai: AI to ponder for, the opponent's stone is the one expected to move
+            replies: Number of the opponent's best ordered replies to search
+        """
+        self.ai = ai
+        self.replies = replies
+
+        # Transposition key of the position after a reply -> (best move, score or None if the table
+        # lost it, depth searched)
+        self.results: Dict[int, Tuple[Tuple[int, int], Optional[float], int]] = {}
+        self.hits = 0
+        self._thread = None
+
+    def start(self, board: Board):
+        """
+        Args:
+            board: Current state of the board, with the opponent to move (it is copied, not kept)
+        """
+        self.stop()
+        self.results = {}
+        self.ai.cancelled = False
+        self._thread = threading.Thread(target=self._ponder, args=(board.copy(),), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Blocks until the search notices, which takes at most one clock poll (AI.NODE_POLL nodes)
+        if self._thread is None:
+            return
+        self.ai.cancelled = True
+        self._thread.join()
+        self._thread = None
+        self.ai.cancelled = False
+
+    def ai_move_with_pruning(self, board: Board) -> Tuple[int, int]:
+        """
+        Same as ai.ai_move_with_pruning, answered from the pondered results when the opponent
+        played an expected reply.
+
+        Args:
+            board: Current state of the board
+
+        Returns:
+            Tuple of (row, col) for the best move
+        """
+        self.stop()
+        result = self.results.get(self.ai._tt_key(board, True))
+        if result is not None and result[2] >= self.ai.max_depth and board.get(*result[0]) == 0:
+            self.hits += 1
+            if result[1] is not None:
+                # As if the move had been searched now, the next search centres its window on it
+                self.ai._last_root = (len(board.history), result[1])
+            if self.ai.collect_stats:
+                stats = SearchStats('ponder_hit')
+                stats.move, stats.depth = result[0], result[2]
+                stats.principal_variation = [result[0]]
+                self.ai.last_stats = stats
+            return result[0]
+        # An unexpected or unfinished reply still finds the pondered positions in the table
+        return self.ai.ai_move_with_pruning(board)
+
+    def _expected_replies(self, board: Board) -> List[Tuple[int, int]]:
+        ai = self.ai
+        moves = ai._get_valid_moves(board)
+        return ai._order_moves(board, moves, ai.opponent_stone, 0)[:self.replies]
+
+    def _ponder(self, board: Board):
+        ai = self.ai
+        saved = ai._last_root, ai.last_stats, ai.last_depth
+        try:
+            self._search_replies(board)
+        finally:
+            ai._last_root, ai.last_stats, ai.last_depth = saved
+
+    def _search_replies(self, board: Board):
+        ai = self.ai
+        for row, col in self._expected_replies(board):
+            if ai.cancelled:
+                return
+            ai._make_move(board, row, col, ai.opponent_stone)
+            if not board.has_five(ai.opponent_stone) and not board.is_full():
+                # ai_move deepens one ply at a time and keeps the last finished depth when cancelled
+                move = ai.ai_move(board)
+                key = ai._tt_key(board, True)
+                entry = ai.tt.probe(key)
+                score = entry[2] if entry is not None and entry[4] == move else None
+                depth = ai.last_depth
+                if (depth == 0 and not ai.cancelled) or score in (float('inf'), float('-inf')):
+                    # Answered without a search (book, forced line) or a forced result, deeper changes nothing
+                    depth = ai.max_depth
+                if depth > 0:
+                    self.results[key] = (move, score, depth)
+            ai._unmake_move(board)
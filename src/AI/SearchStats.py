@@ -0,0 +1,83 @@
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+# What one AI move cost. Filled in by an AI created with collect_stats=True, which wraps its hot
+# methods with the counters and timers below; an AI without stats runs the plain methods.
+
+
+class SearchStats:
+    def __init__(self, algorithm: str):
+        """
+        Args:
+            algorithm: Entry point that made the move, e.g. 'ai_move_with_pruning'
+        """
+        self.algorithm = algorithm
+        self.move: Optional[Tuple[int, int]] = None
+        self.depth = 0                 # depth searched, 0 if the move needed no search
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.tt_hits = 0
+        self.cutoffs: List[int] = []   # beta cutoffs by ply from the root
+        self.principal_variation: List[Tuple[int, int]] = []
+
+        # Wall-clock time, the move total and the parts spent in the wrapped methods (evaluation
+        # includes its own win check, win_check is the search's terminal test)
+        self.time_ms = 0.0
+        self.move_generation_ms = 0.0
+        self.evaluation_ms = 0.0
+        self.win_check_ms = 0.0
+        self.threat_search_ms = 0.0
+
+    @property
+    def effective_branching_factor(self) -> float:
+        # The b with b ** depth == nodes
+        if self.depth <= 0 or self.nodes <= 0:
+            return 0.0
+        return self.nodes ** (1 / self.depth)
+
+    def count_cutoff(self, ply: int):
+        while len(self.cutoffs) <= ply:
+            self.cutoffs.append(0)
+        self.cutoffs[ply] += 1
+
+    def to_dict(self) -> Dict:
+        return {'algorithm': self.algorithm, 'move': list(self.move) if self.move else None,
+                'depth': self.depth, 'nodes': self.nodes, 'leaf_evaluations': self.leaf_evaluations,
+                'tt_hits': self.tt_hits, 'cutoffs_by_ply': self.cutoffs,
+                'effective_branching_factor': round(self.effective_branching_factor, 2),
+                'principal_variation': [list(move) for move in self.principal_variation],
+                'time_ms': round(self.time_ms, 3), 'move_generation_ms': round(self.move_generation_ms, 3),
+                'evaluation_ms': round(self.evaluation_ms, 3), 'win_check_ms': round(self.win_check_ms, 3),
+                'threat_search_ms': round(self.threat_search_ms, 3)}
+
+    def to_json(self, **extra) -> str:
+        # One line of JSON, extra keys (e.g. the player) first
+        record = dict(extra)
+        record.update(self.to_dict())
+        return json.dumps(record)
+
+
+def timed(function, stats_of, field: str, counter: Optional[str] = None):
+    """
+    Args:
+        function: Method to wrap
+        stats_of: Returns the SearchStats being filled, None outside a move
+        field: Time attribute (ms) the calls are added to
+        counter: Count attribute increased on every call, if any
+
+    Returns:
+        The wrapped method
+    """
+    def wrapper(*args, **kwargs):
+        stats = stats_of()
+        if stats is None:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            setattr(stats, field, getattr(stats, field) + (time.perf_counter() - start) * 1000)
+            if counter is not None:
+                setattr(stats, counter, getattr(stats, counter) + 1)
+    return wrapper
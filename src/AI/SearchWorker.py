@@ -0,0 +1,47 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Tuple
+from Engine.Board import Board
+from AI.AI import AI
+
+# Runs AI moves off the GUI thread: submit() returns at once with a future and the event loop keeps
+# running while the search works on a copy of the board (the real one is still being drawn).
+
+
+class SearchWorker:
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai-search')
+        self._future = None
+        self._ai = None
+
+    def submit(self, ai: AI, search: Callable[[Board], Tuple[int, int]], board: Board) -> Future:
+        """
+        Args:
+            ai: AI doing the search, needed to cancel it
+            search: Move function to run, e.g. ai.ai_move_with_pruning or a Ponderer's
+            board: Current state of the board (copied, later moves do not affect the search)
+
+        Returns:
+            Future of the (row, col) move
+        """
+        self._ai = ai
+        self._future = self._executor.submit(search, board.copy())
+        return self._future
+
+    @property
+    def busy(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def cancel(self):
+        # Stops the running search within one clock poll and waits for it, its future raises SearchTimeout
+        # (or holds ai_move's best move so far)
+        if not self.busy or self._future.cancel():
+            return
+        self._ai.cancelled = True
+        try:
+            self._future.exception()
+        finally:
+            self._ai.cancelled = False
+
+    def close(self):
+        self.cancel()
+        self._executor.shutdown()
@@ -0,0 +1,227 @@
+from itertools import combinations
+from typing import Callable, List, Optional, Tuple
+from Engine.Board import Board
+
+# Threat-space search: the attacker only plays fours (VCF, victory by continuous fours) and
+# optionally threes (VCT), so the defender has one or a handful of replies and the tree stays
+# tiny even 10 to 20 plies deep. Threats are found on the bitboards with fixed-width windows.
+
+
+class SearchTimeout(Exception):
+    # Raised inside a search when its deadline has passed or it was cancelled
+    pass
+
+
+class ThreatSearch:
+    # Nodes between two calls of should_stop, a VCT node scans the board several times so this is a few ms
+    STOP_POLL = 16
+
+    def __init__(self, win_length: int = 5, max_nodes: int = 5000, should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            win_length: Number of stones in a row needed to win
+            max_nodes: Positions a single solve may visit before giving up (keeps VCT bounded)
+            should_stop: Polled during a solve, once it returns True the solve raises SearchTimeout
+                (e.g. a deadline or a cancel flag of the caller), None to always run to the end
+        """
+        self.win_length = win_length
+        self.max_nodes = max_nodes
+        self.should_stop = should_stop
+        self.nodes = 0
+        self._failed = {}
+
+    def find_win(self, board: Board, attacker: int, max_depth: int, vct: bool = False) -> Optional[List[Tuple[int, int]]]:
+        """
+        Args:
+            board: Current state of the board, with the attacker to move
+            attacker: Stone value of the attacking player
+            max_depth: Maximum number of attacker moves in the sequence
+            vct: Also allow threes as threats (VCT), fours only (VCF) otherwise
+
+        Returns:
+            Winning line as a list of moves, attacker and defender alternating and starting
+            with the attacker (one defence shown where it has a choice), None if none was found
+
+        Raises:
+            SearchTimeout: should_stop returned True, the board is left as it was given
+        """
+        self.nodes = 0
+        self._failed = {}
+        return self._attack(board, attacker, max_depth, vct)
+
+    def find_defence(self, board: Board, defender: int, max_depth: int, vct: bool = False) -> Optional[Tuple[int, int]]:
+        """
+        Args:
+            board: Current state of the board, with the defender to move
+            defender: Stone value of the player to move
+            max_depth: Maximum number of attacker moves to look for
+            vct: Also consider the opponent's threes (VCT)
+
+        Returns:
+            A move that stops the opponent's forced win, the opponent's key cell if no move
+            stops it, or None if the opponent has no forced win
+
+        Raises:
+            SearchTimeout: should_stop returned True, the board is left as it was given
+        """
+        attacker = 3 - defender
+        line = self.find_win(board, attacker, max_depth, vct)
+        if line is None:
+            return None
+
+        # The cells of the winning line are the natural defences, own fours gain a tempo
+        stride = board.stride
+        candidates = list(dict.fromkeys(line[0::2]))
+        candidates += [divmod(idx, stride) for idx in Board.bit_indices(self.four_cells(board, defender))]
+        for row, col in candidates:
+            if board.get(row, col) != 0:
+                continue
+            board.make_move(row, col, defender)
+            try:
+                refuted = self.find_win(board, attacker, max_depth, vct) is None
+            finally:
+                board.unmake_move()
+            if refuted:
+                return (row, col)
+        return line[0]
+
+    def five_cells(self, board: Board, stone: int) -> int:
+        # Empty cells that complete win_length in a row
+        cells = 0
+        for shift, window, empties in self._windows(board, stone, self.win_length, False, self.win_length - 1):
+            cells |= window << (empties[0] * shift)
+        return cells
+
+    def four_cells(self, board: Board, stone: int) -> int:
+        # Empty cells that make a four (a stone short of five with the last cell free)
+        cells = 0
+        for shift, window, empties in self._windows(board, stone, self.win_length, False, self.win_length - 2):
+            for position in empties:
+                cells |= window << (position * shift)
+        return cells
+
+    def three_cells(self, board: Board, stone: int) -> int:
+        # Empty cells that make a three, a shape that becomes an open four (_XXXX_) with one more stone
+        cells = 0
+        for shift, window, empties in self._windows(board, stone, self.win_length + 1, True, self.win_length - 3):
+            for position in empties:
+                cells |= window << (position * shift)
+        return cells
+
+    def open_four_cells(self, board: Board, stone: int) -> int:
+        # Empty cells that make an open four (_XXXX_), which cannot be stopped
+        cells = 0
+        for shift, window, empties in self._windows(board, stone, self.win_length + 1, True, self.win_length - 2):
+            cells |= window << (empties[0] * shift)
+        return cells
+
+    def three_defence_cells(self, board: Board, stone: int) -> int:
+        # Every empty cell of the windows where the stone threatens an open four
+        cells = 0
+        empty = board.full_mask & ~board.occupied
+        for shift, window, _ in self._windows(board, stone, self.win_length + 1, True, self.win_length - 2):
+            for position in range(self.win_length + 1):
+                cells |= (window << (position * shift)) & empty
+        return cells
+
+    def _windows(self, board: Board, stone: int, length: int, ends_empty: bool, stones: int):
+        """
+        Args:
+            board: Current state of the board
+            stone: Stone value to match
+            length: Window length
+            ends_empty: Whether both end cells of the window must be empty
+            stones: Number of stones required in the window (between the ends if ends_empty), the other cells must be empty
+
+        Yields:
+            Tuples of (bit shift of the direction, mask of window start cells, positions of the empty inner cells)
+        """
+        own = board.bitboards[stone]
+        empty = board.full_mask & ~board.occupied
+        inner = list(range(1, length - 1)) if ends_empty else list(range(length))
+        # The spare bit after every row is neither a stone nor empty, so no window wraps around
+        for shift in (1, board.stride, board.stride + 1, board.stride - 1):
+            own_at = [own >> (k * shift) for k in range(length)]
+            empty_at = [empty >> (k * shift) for k in range(length)]
+            base = empty_at[0] & empty_at[length - 1] if ends_empty else -1
+            if not base:
+                continue
+            for empties in combinations(inner, len(inner) - stones):
+                window = base
+                for k in inner:
+                    window &= empty_at[k] if k in empties else own_at[k]
+                    if not window:
+                        break
+                if window:
+                    yield shift, window, empties
+
+    def _attack(self, board: Board, attacker: int, depth: int, vct: bool) -> Optional[List[Tuple[int, int]]]:
+        # Attacker to move
+        self.nodes += 1
+        if self.should_stop is not None and not self.nodes % self.STOP_POLL and self.should_stop():
+            raise SearchTimeout()
+        stride = board.stride
+        wins = self.five_cells(board, attacker)
+        if wins:
+            return [divmod(next(Board.bit_indices(wins)), stride)]
+        if depth == 0 or self.nodes > self.max_nodes:
+            return None
+
+        key = (board.hash, attacker)
+        if self._failed.get(key, -1) >= depth:
+            return None
+
+        threats = self.five_cells(board, 3 - attacker)
+        if threats:
+            # The defender threatens five, blocking it is the only move and has to be a threat itself
+            if threats & (threats - 1):
+                return None
+            candidates = threats
+        else:
+            candidates = self.four_cells(board, attacker)
+            if vct:
+                candidates |= self.three_cells(board, attacker)
+
+        for idx in Board.bit_indices(candidates):
+            move = divmod(idx, stride)
+            board.make_move(move[0], move[1], attacker)
+            try:
+                line = self._defend(board, attacker, depth, vct)
+            finally:
+                board.unmake_move()
+            if line is not None:
+                return [move] + line
+
+        self._failed[key] = depth
+        return None
+
+    def _defend(self, board: Board, attacker: int, depth: int, vct: bool) -> Optional[List[Tuple[int, int]]]:
+        # Defender to move after an attacker move, the line only works if every defence loses
+        defender = 3 - attacker
+        stride = board.stride
+        if self.five_cells(board, defender):
+            return None
+
+        threats = self.five_cells(board, attacker)
+        if threats:
+            # A four: the only defence is to take the cell (two such cells cannot both be taken)
+            replies = threats
+        elif vct and self.open_four_cells(board, attacker):
+            # A three: block it anywhere in its window, or counter with a four
+            replies = self.three_defence_cells(board, attacker) | self.four_cells(board, defender)
+        else:
+            return None
+
+        shown = None
+        for idx in Board.bit_indices(replies):
+            reply = divmod(idx, stride)
+            board.make_move(reply[0], reply[1], defender)
+            try:
+                line = self._attack(board, attacker, depth - 1, vct)
+            finally:
+                board.unmake_move()
+            if line is None:
+                return None
+            if shown is None:
+                shown = [reply] + line
+        return shown
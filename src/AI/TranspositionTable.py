@@ -0,0 +1,74 @@
+from typing import Optional, Tuple
+
+
+class TranspositionTable:
+    # Bound types of a stored score, scores are from the point of view of the side to move
+    EXACT = 0   # The score is the true negamax value
+    LOWER = 1   # The search failed high, the true value is at least the score
+    UPPER = 2   # The search failed low, the true value is at most the score
+
+    def __init__(self, size: int = 1 << 16):
+        """
+        Fixed size table, memory stays bounded no matter how many positions are searched.
+        Every bucket has two slots: a depth-preferred one that keeps the deepest result,
+        and an always-replace one that takes whatever the depth-preferred slot refused.
+
+        Args:
+            size: Number of buckets, rounded up to a power of two (holds up to 2 * size entries)
+        """
+        buckets = 1
+        while buckets < size:
+            buckets <<= 1
+        self.size = buckets
+        self._mask = buckets - 1
+        self.generation = 0
+
+        # Entries are tuples of (key, depth, score, flag, best_move, generation)
+        self._deep = [None] * buckets
+        self._recent = [None] * buckets
+
+    def new_search(self):
+        # Entries from older searches may be replaced in the depth-preferred slot even if deeper
+        self.generation += 1
+
+    def clear(self):
+        self._deep = [None] * self.size
+        self._recent = [None] * self.size
+        self.generation = 0
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, int, Optional[Tuple[int, int]], int]]:
+        """
+        Args:
+            key: Zobrist key of the position
+
+        Returns:
+            The stored entry tuple or None if the position is not in the table
+        """
+        slot = key & self._mask
+        entry = self._deep[slot]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self._recent[slot]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, flag: int, best_move: Optional[Tuple[int, int]]):
+        """
+        Args:
+            key: Zobrist key of the position
+            depth: Remaining depth the score was searched to
+            score: Score found for the position
+            flag: One of EXACT, LOWER or UPPER
+            best_move: Best (row, col) found, or None
+        """
+        slot = key & self._mask
+        entry = (key, depth, score, flag, best_move, self.generation)
+        deep = self._deep[slot]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self.generation:
+            self._deep[slot] = entry
+        else:
+            self._recent[slot] = entry
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._deep) + sum(entry is not None for entry in self._recent)
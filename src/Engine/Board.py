@@ -1,19 +1,243 @@
+import random
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _line_masks(size: int, stride: int):
+    # Row, column and both diagonal masks only depend on the board geometry,
+    # so every Board of the same size shares one set of them
+    rows = [0] * size
+    cols = [0] * size
+    diags = [0] * (2 * size - 1)        # indexed by row - col + size - 1 ( \ direction )
+    anti_diags = [0] * (2 * size - 1)   # indexed by row + col ( / direction )
+    for row in range(size):
+        for col in range(size):
+            bit = 1 << (row * stride + col)
+            rows[row] |= bit
+            cols[col] |= bit
+            diags[row - col + size - 1] |= bit
+            anti_diags[row + col] |= bit
+    full = 0
+    for mask in rows:
+        full |= mask
+    return full, tuple(rows), tuple(cols), tuple(diags), tuple(anti_diags)
+
+
+@lru_cache(maxsize=None)
+def _neighbourhood_masks(size: int, stride: int, distance: int):
+    # For every cell index, the square of cells within `distance` of it (the cell itself included)
+    masks = [0] * (size * stride)
+    for row in range(size):
+        for col in range(size):
+            mask = 0
+            for i in range(max(0, row - distance), min(size, row + distance + 1)):
+                for j in range(max(0, col - distance), min(size, col + distance + 1)):
+                    mask |= 1 << (i * stride + j)
+            masks[row * stride + col] = mask
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def _line_geometry(size: int, stride: int):
+    # Numbers every row, column and diagonal as a line, and for every cell index lists the four
+    # (line, 3 ** position) pairs it belongs to. Positions run in the direction the evaluator walks:
+    # rows by column, columns / both diagonals by row
+    lengths = []
+    cell_lines = [[] for _ in range(size * stride)]
+
+    def add_line(cells):
+        line = len(lengths)
+        lengths.append(len(cells))
+        for position, (row, col) in enumerate(cells):
+            cell_lines[row * stride + col].append((line, 3 ** position))
+
+    for row in range(size):
+        add_line([(row, col) for col in range(size)])
+    for col in range(size):
+        add_line([(row, col) for row in range(size)])
+    for diff in range(-(size - 1), size):     # \ diagonals, col = row - diff
+        add_line([(row, row - diff) for row in range(size) if 0 <= row - diff < size])
+    for total in range(2 * size - 1):         # / diagonals, col = total - row
+        add_line([(row, total - row) for row in range(size) if 0 <= total - row < size])
+    return tuple(lengths), tuple(tuple(lines) for lines in cell_lines)
+
+
+@lru_cache(maxsize=None)
+def _zobrist_keys(size: int, stride: int):
+    # Fixed seed so the same position hashes the same in every process and every run
+    rng = random.Random(0x60B0C0)
+    cells = [[0] * (size * stride) for _ in range(3)]
+    for stone in (1, 2):
+        for row in range(size):
+            for col in range(size):
+                cells[stone][row * stride + col] = rng.getrandbits(64)
+    side = (0, rng.getrandbits(64), rng.getrandbits(64))
+    return tuple(tuple(keys) for keys in cells), side
+
+
 class Board:
     DIMENSIONS = 15
     BLACK = 1
     WHITE = 2
+    # Empty cells within this distance of a stone are the candidate moves
+    CANDIDATE_DISTANCE = 2
+
+    def __init__(self, size: int = DIMENSIONS):
+        """
+        Args:
+            size: Number of rows and columns, 15 for standard Gomoku, 19 on a Go board
+                  (for far larger boards see SparseBoard)
+        """
+        self.size = size
+        # Every row is stored with one spare bit after it, so shifting a bitboard
+        # by one column can never carry a stone over onto the next row
+        self.stride = self.size + 1
+
+        # One bitmask per colour (index 0 is unused) plus a flat mailbox of the same
+        # layout for O(1) single cell reads. Bit / cell index is row * stride + col
+        self.bitboards = [0, 0, 0]
+        self.cells = [0] * (self.stride * self.size)
+        self.history = []
+        self.stone_count = 0
+
+        # Union of the neighbourhoods of all stones on the board. make_move ORs in the new stone's
+        # neighbourhood and keeps the previous value on a stack so unmake_move restores it in O(1)
+        self.near_mask = 0
+        self._near_stack = []
+        self._neighbourhoods = _neighbourhood_masks(self.size, self.stride, self.CANDIDATE_DISTANCE)
+
+        (self.full_mask, self.row_masks, self.col_masks,
+         self.diag_masks, self.anti_diag_masks) = _line_masks(self.size, self.stride)
+
+        # Zobrist hash of the stones on the board, kept up to date by make/unmake.
+        # side_keys[stone] can be mixed in by searches that also need the side to move
+        self.zobrist_keys, self.side_keys = _zobrist_keys(self.size, self.stride)
+        self.hash = 0
+
+        # Every line's content as a base 3 number (digit 0 empty, 1 black, 2 white), so a line
+        # can be scored by looking its code up instead of walking its cells
+        self.line_lengths, self.cell_lines = _line_geometry(self.size, self.stride)
+        self.line_codes = [0] * len(self.line_lengths)
+
+    @property
+    def matrix(self):
+        """
+        Compatibility view of the position as a list of rows (0 = empty).
+        This is a fresh copy, writing into it does not change the board, use make_move instead.
+        """
+        cells, stride = self.cells, self.stride
+        return [cells[row * stride:row * stride + self.size] for row in range(self.size)]
+
+    @property
+    def occupied(self) -> int:
+        return self.bitboards[self.BLACK] | self.bitboards[self.WHITE]
+
+    @property
+    def candidates(self) -> int:
+        # Empty cells that have a stone within CANDIDATE_DISTANCE
+        return self.near_mask & ~(self.bitboards[self.BLACK] | self.bitboards[self.WHITE])
+
+    @property
+    def last_move(self):
+        return self.history[-1] if self.history else None
+
+    def index(self, row: int, col: int) -> int:
+        return row * self.stride + col
+
+    def get(self, row: int, col: int) -> int:
+        return self.cells[row * self.stride + col]
+
+    def in_bounds(self, row: int, col: int) -> bool:
+        return 0 <= row < self.size and 0 <= col < self.size
+
+    def copy(self) -> 'Board':
+        # Same size and stones, replayed so the history (and unmake_move) carries over
+        board = Board(self.size)
+        for row, col, stone in self.history:
+            board.make_move(row, col, stone)
+        return board
+
+    def make_move(self, row: int, col: int, stone: int):
+        """
+        Places a stone without any validation, the caller must make sure the cell is empty.
+
+        Args:
+            row: Row index
+            col: Column index
+            stone: Stone value to place (BLACK or WHITE)
+        """
+        idx = row * self.stride + col
+        self.cells[idx] = stone
+        self.bitboards[stone] |= 1 << idx
+        self.hash ^= self.zobrist_keys[stone][idx]
+        codes = self.line_codes
+        for line, power in self.cell_lines[idx]:
+            codes[line] += stone * power
+        self.history.append((row, col, stone))
+        self.stone_count += 1
+        self._near_stack.append(self.near_mask)
+        self.near_mask |= self._neighbourhoods[idx]
+
+    def unmake_move(self):
+        """
+        Takes back the most recent make_move.
+
+        Returns:
+            Tuple of (row, col, stone) that was removed
+        """
+        row, col, stone = self.history.pop()
+        idx = row * self.stride + col
+        self.cells[idx] = 0
+        self.bitboards[stone] &= ~(1 << idx)
+        self.hash ^= self.zobrist_keys[stone][idx]
+        codes = self.line_codes
+        for line, power in self.cell_lines[idx]:
+            codes[line] -= stone * power
+        self.stone_count -= 1
+        self.near_mask = self._near_stack.pop()
+        return row, col, stone
+
+    def is_full(self) -> bool:
+        return self.stone_count == self.size * self.size
+
+    def has_five(self, stone: int, length: int = 5) -> bool:
+        # A run of `length` stones survives `length - 1` shift-and steps in its direction.
+        # The padding bit after each row keeps horizontal and diagonal runs from wrapping.
+        bits = self.bitboards[stone]
+        for shift in (1, self.stride, self.stride + 1, self.stride - 1):
+            run = bits
+            for _ in range(length - 1):
+                run &= run >> shift
+                if not run:
+                    break
+            if run:
+                return True
+        return False
+
+    def lines_through(self, row: int, col: int):
+        # Row, column, \ diagonal and / diagonal masks passing through the cell
+        return (self.row_masks[row], self.col_masks[col],
+                self.diag_masks[row - col + self.size - 1], self.anti_diag_masks[row + col])
+
+    def neighbourhood(self, row: int, col: int, distance: int = 2) -> int:
+        return _neighbourhood_masks(self.size, self.stride, distance)[row * self.stride + col]
 
-    def __init__(self):
-        self.matrix = [[0 for _ in range(self.DIMENSIONS)] for _ in range(self.DIMENSIONS)]
+    @staticmethod
+    def bit_indices(mask: int):
+        # Yields the index of every set bit from lowest to highest (row-major order)
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
 
     def display(self):
         for row_idx, row in enumerate(self.matrix):
             print(f"{row_idx:2}", end=" ")
             for cell in row:
                 if cell == self.BLACK:
-                    print(" ●", end="")  
+                    print(" ●", end="")
                 elif cell == self.WHITE:
-                    print(" ○", end="")  
+                    print(" ○", end="")
                 else:
-                    print(" .", end="") 
-            print() 
\ No newline at end of file
+                    print(" .", end="")
+            print()
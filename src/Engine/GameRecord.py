@@ -0,0 +1,207 @@
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterator, List, Optional, Tuple
+from Engine.Board import Board
+
+# Binary game records: a file of finished games that is only ever appended to, and read back
+# memory-mapped, so a file of millions of games opens at once and is walked game by game.
+#
+#   header: magic, version, board size, bytes per move
+#   games:  16-bit number of moves, 8-bit stone of the first move, the moves, 8-bit result
+#
+# A move is its cell index row * size + col, one byte on boards up to 16x16 and two above.
+# The colours alternate from the first move's, which is not always black (in the GUI's AI vs AI
+# mode white opens). The result is Manager.DRAW / BLACK_WIN / WHITE_WIN, or UNFINISHED for a
+# game that was stopped. Version 1 files, where black always moved first and games had no stone
+# byte, are still read.
+
+_HEADER = struct.Struct('<4sHBB')
+_GAME_HEADERS = {1: struct.Struct('<H'), 2: struct.Struct('<HB')}
+_MAGIC = b'GMKR'
+_VERSION = 2
+
+UNFINISHED = 0
+
+
+def _cell_bytes(size: int) -> int:
+    return 1 if size * size <= 256 else 2
+
+
+def is_record_file(path: str) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(_MAGIC)) == _MAGIC
+
+
+class GameRecordWriter:
+    def __init__(self, path: str, board_size: int = Board.DIMENSIONS):
+        """
+        Args:
+            path: File to append the games to, created with its header if it does not exist
+            board_size: Size of the board the games are played on (must match an existing file)
+        """
+        self.path = path
+        self.board_size = board_size
+        self._cell_bytes = _cell_bytes(board_size)
+        self._move_format = '<%dB' if self._cell_bytes == 1 else '<%dH'
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as file:
+                magic, version, size, _ = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{path} is not a version {_VERSION} game record file")
+            if size != board_size:
+                raise ValueError(f"{path} holds {size}x{size} games, not {board_size}x{board_size}")
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION, board_size, self._cell_bytes))
+            self._file.flush()
+        self.games = 0
+
+    def write_game(self, moves: List[Tuple[int, ...]], result: int, first_stone: int = Board.BLACK):
+        """
+        Args:
+            moves: Moves of the game in order, (row, col) or (row, col, stone) like Board.history
+            result: Manager.DRAW / BLACK_WIN / WHITE_WIN, or UNFINISHED
+            first_stone: Stone of the first move, only used when the moves do not give their stones
+        """
+        size = self.board_size
+        if moves and len(moves[0]) > 2:
+            first_stone = moves[0][2]
+            for ply, move in enumerate(moves):
+                if move[2] != (first_stone if ply % 2 == 0 else 3 - first_stone):
+                    raise ValueError(f"move {ply + 1} of the game is not the other colour's, the format needs alternating moves")
+        cells = [move[0] * size + move[1] for move in moves]
+        self._file.write(_GAME_HEADERS[_VERSION].pack(len(cells), first_stone)
+                         + struct.pack(self._move_format % len(cells), *cells) + bytes((result,)))
+        self.games += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordedGame:
+    __slots__ = ('_reader', '_offset', 'moves_count', 'first_stone', 'result')
+
+    def __init__(self, reader: 'GameRecordReader', offset: int, moves_count: int, first_stone: int, result: int):
+        # A view of one game in the mapped file, the moves are only decoded when asked for
+        self._reader = reader
+        self._offset = offset
+        self.moves_count = moves_count
+        self.first_stone = first_stone
+        self.result = result
+
+    def __len__(self):
+        return self.moves_count
+
+    @property
+    def moves(self) -> List[Tuple[int, int, int]]:
+        # Moves as (row, col, stone), in the format of Board.history
+        cells = self._reader._cells(self._offset, self.moves_count)
+        size = self._reader.board_size
+        first, second = self.first_stone, 3 - self.first_stone
+        return [(cell // size, cell % size, first if ply % 2 == 0 else second)
+                for ply, cell in enumerate(cells)]
+
+    def replay(self) -> Board:
+        # The final position
+        board = Board(self._reader.board_size)
+        for row, col, stone in self.moves:
+            board.make_move(row, col, stone)
+        return board
+
+
+class GameRecordReader:
+    def __init__(self, path: str):
+        """
+        Args:
+            path: File written by GameRecordWriter
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < _HEADER.size:
+                raise ValueError(f"{path} is not a game record file")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.board_size, self.cell_bytes = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or self.version not in _GAME_HEADERS:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {' or '.join(map(str, _GAME_HEADERS))} game record file")
+        self._game_header = _GAME_HEADERS[self.version]
+
+        # Start of every game (8 bytes each), only built when a game is asked for by number
+        self._offsets: Optional[array] = None
+
+    def __iter__(self) -> Iterator[RecordedGame]:
+        # Game by game from the start of the file, reading two numbers per game
+        data = self._map
+        offset = _HEADER.size
+        end = len(data)
+        cell_bytes = self.cell_bytes
+        game_header = self._game_header
+        while offset + game_header.size <= end:
+            count, first_stone = self._unpack_game_header(offset)
+            result_at = offset + game_header.size + count * cell_bytes
+            if result_at >= end:
+                break   # a game cut off by a crash while it was written
+            yield RecordedGame(self, offset, count, first_stone, data[result_at])
+            offset = result_at + 1
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def __getitem__(self, number: int) -> RecordedGame:
+        offsets = self._index()
+        offset = offsets[number]
+        count, first_stone = self._unpack_game_header(offset)
+        return RecordedGame(self, offset, count, first_stone,
+                            self._map[offset + self._game_header.size + count * self.cell_bytes])
+
+    def positions(self) -> Iterator[Tuple[int, int, Board]]:
+        """
+        Yields:
+            Tuples of (game number, ply, board) for every position of every game, the empty board
+            (ply 0) included. Within a game it is the same Board object moved along in place, copy it
+            to keep a position.
+        """
+        for number, game in enumerate(self):
+            board = Board(self.board_size)
+            yield number, 0, board
+            for ply, (row, col, stone) in enumerate(game.moves, 1):
+                board.make_move(row, col, stone)
+                yield number, ply, board
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _index(self) -> array:
+        if self._offsets is None:
+            self._offsets = array('Q', (game._offset for game in self))
+        return self._offsets
+
+    def _unpack_game_header(self, offset: int) -> Tuple[int, int]:
+        # (number of moves, stone of the first move) of the game at offset
+        if self.version == 1:
+            return _GAME_HEADERS[1].unpack_from(self._map, offset)[0], Board.BLACK
+        return self._game_header.unpack_from(self._map, offset)
+
+    def _cells(self, offset: int, count: int):
+        start = offset + self._game_header.size
+        if self.cell_bytes == 1:
+            return self._map[start:start + count]
+        return struct.unpack_from(f'<{count}H', self._map, start)
@@ -4,29 +4,46 @@ class Manager:
     BLACK_WIN = 2
     WHITE_WIN = 3
 
-    def __init__(self, board):
+    def __init__(self, board, recorder=None):
+        # recorder: a GameRecord.GameRecordWriter the game is appended to once it is over
         self.board = board
+        self.recorder = recorder
+        self.finished = False
     
     def play(self, x, y, color):
         
-        if(self.board.matrix[x][y] != 0):
+        # Off the board or on a stone, the same player has to try again
+        if(not self.board.in_bounds(x, y) or self.board.get(x, y) != 0):
             return -1
         
-        self.board.matrix[x][y] = color
+        self.board.make_move(x, y, color)
         
         result = self.__is_over(x, y, color)
 
         if result == self.WHITE_WIN:
+            self.__record(self.WHITE_WIN)
             return self.WHITE_WIN
         
         elif result == self.BLACK_WIN:
+            self.__record(self.BLACK_WIN)
             return self.BLACK_WIN
         
         elif self.__is_board_full():
+            self.__record(self.DRAW)
             return self.DRAW
         
         return 0
 
+    def abandon(self):
+        # The game stops before it is over (e.g. the window is closed), it is recorded as unfinished
+        if not self.finished and self.board.history:
+            self.__record(0)    # GameRecord.UNFINISHED
+
+    def __record(self, result):
+        self.finished = True
+        if self.recorder is not None:
+            self.recorder.write_game(self.board.history, result)
+
 
     def __is_over(self, last_x, last_y, color):
 
@@ -41,8 +58,8 @@ class Manager:
             count = 1  # the stone just placed
             for dx, dy in axis:
                 nx, ny = last_x + dx, last_y + dy
-                while 0 <= nx < self.board.DIMENSIONS and 0 <= ny < self.board.DIMENSIONS:
-                    if self.board.matrix[nx][ny] == color:
+                while self.board.in_bounds(nx, ny):
+                    if self.board.get(nx, ny) == color:
                         count += 1
                         nx += dx
                         ny += dy
@@ -53,8 +70,4 @@ class Manager:
         return self.DRAW
 
     def __is_board_full(self):
-        # no defination for blank place in board so will use 0
-        for row in self.board.matrix:
-            if 0 in row:
-                return False
-        return True
\ No newline at end of file
+        return self.board.is_full()
\ No newline at end of file
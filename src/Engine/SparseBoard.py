@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional, Tuple
+from Engine.Board import Board
+
+# Board for very large or unbounded (freestyle) games. Only the stones are stored, keyed by their
+# cell, so making a move, the win check and move generation cost in the number of stones rather
+# than in the board area. The search does not run on it directly: window() cuts out a dense Board
+# of the rows and columns around the stones, which is what AI's entry points search (see
+# AI._on_window). Its cost follows the number of stones, not how far apart they are.
+
+_DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class SparseBoard:
+    BLACK = Board.BLACK
+    WHITE = Board.WHITE
+    CANDIDATE_DISTANCE = Board.CANDIDATE_DISTANCE
+
+    # Window sides are rounded up to a multiple of this, so consecutive moves mostly reuse the
+    # geometry tables Board caches per size (a few sizes over a game, the side grows with the stones)
+    WINDOW_STEP = 8
+
+    def __init__(self, size: Optional[int] = None):
+        """
+        Args:
+            size: Number of rows and columns, None for an unbounded board (any int coordinates,
+                  negative ones included, the first stone usually goes to (0, 0))
+        """
+        self.size = size
+        self.stones: Dict[Tuple[int, int], int] = {}
+        self.history = []
+        self.stone_count = 0
+
+        # How many stones have each cell within CANDIDATE_DISTANCE, the empty ones are the candidates
+        self._near: Dict[Tuple[int, int], int] = {}
+
+    @property
+    def last_move(self):
+        return self.history[-1] if self.history else None
+
+    def candidate_cells(self) -> List[Tuple[int, int]]:
+        # Empty cells that have a stone within CANDIDATE_DISTANCE, in row-major order like Board.candidates
+        stones = self.stones
+        return sorted(cell for cell in self._near if cell not in stones)
+
+    def get(self, row: int, col: int) -> int:
+        return self.stones.get((row, col), 0)
+
+    def in_bounds(self, row: int, col: int) -> bool:
+        return self.size is None or (0 <= row < self.size and 0 <= col < self.size)
+
+    def make_move(self, row: int, col: int, stone: int):
+        """
+        Places a stone without any validation, the caller must make sure the cell is empty.
+
+        Args:
+            row: Row index
+            col: Column index
+            stone: Stone value to place (BLACK or WHITE)
+        """
+        self.stones[(row, col)] = stone
+        self.history.append((row, col, stone))
+        self.stone_count += 1
+        near = self._near
+        for cell in self._neighbourhood(row, col):
+            near[cell] = near.get(cell, 0) + 1
+
+    def unmake_move(self):
+        """
+        Takes back the most recent make_move.
+
+        Returns:
+            Tuple of (row, col, stone) that was removed
+        """
+        row, col, stone = self.history.pop()
+        del self.stones[(row, col)]
+        self.stone_count -= 1
+        near = self._near
+        for cell in self._neighbourhood(row, col):
+            if near[cell] == 1:
+                del near[cell]
+            else:
+                near[cell] -= 1
+        return row, col, stone
+
+    def is_full(self) -> bool:
+        return self.size is not None and self.stone_count == self.size * self.size
+
+    def has_five(self, stone: int, length: int = 5) -> bool:
+        # Every run is counted once, from its first stone
+        stones = self.stones
+        for (row, col), value in stones.items():
+            if value != stone:
+                continue
+            for dr, dc in _DIRECTIONS:
+                if stones.get((row - dr, col - dc)) == stone:
+                    continue
+                run = 1
+                while stones.get((row + run * dr, col + run * dc)) == stone:
+                    run += 1
+                if run >= length:
+                    return True
+        return False
+
+    def is_winning_move(self, row: int, col: int, length: int = 5) -> bool:
+        # Whether the stone on the cell is part of `length` (or more) in a row
+        stones = self.stones
+        stone = stones.get((row, col))
+        if stone is None:
+            return False
+        for dr, dc in _DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                r, c = row + dr * sign, col + dc * sign
+                while stones.get((r, c)) == stone:
+                    count += 1
+                    r += dr * sign
+                    c += dc * sign
+            if count >= length:
+                return True
+        return False
+
+    def bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        # (top row, left col, bottom row, right col) of the stones, None on an empty board
+        if not self.stones:
+            return None
+        rows = [row for row, _ in self.stones]
+        cols = [col for _, col in self.stones]
+        return min(rows), min(cols), max(rows), max(cols)
+
+    def window(self, margin: int) -> Tuple[Board, List[int], List[int]]:
+        """
+        Cuts out the rows and columns within `margin` of a stone, the others are empty and left out,
+        so far apart groups of stones sit closer together in the window than on this board. Every
+        group keeps its exact surroundings up to the margin and no stone comes within `margin` of
+        another group's that was not there already, so a search and evaluation that stay within the
+        margin of the stones see the same shapes as on the whole board, and the window grows with
+        the number of stones instead of the area they are spread over.
+
+        Args:
+            margin: Empty cells kept around the stones on every side (less at the edge of a bounded board)
+
+        Returns:
+            Tuple of (dense Board holding the stones in the same order, row of this board of every
+            window row, column of this board of every window column), the cell (row, col) of the
+            window is (rows[row], cols[col]) here. An empty board gives a window centered on the
+            middle of the board ((0, 0) when unbounded).
+        """
+        if self.stones:
+            rows = self._window_lines([row for row, _ in self.stones], margin)
+            cols = self._window_lines([col for _, col in self.stones], margin)
+        else:
+            middle = self.size // 2 if self.size is not None else 0
+            rows = cols = self._window_lines([middle], margin)
+
+        side = max(len(rows), len(cols))
+        side = -(-side // self.WINDOW_STEP) * self.WINDOW_STEP
+        if self.size is not None:
+            side = min(side, self.size)
+        rows, cols = self._pad_lines(rows, side), self._pad_lines(cols, side)
+
+        board = Board(side)
+        row_of = {row: index for index, row in enumerate(rows)}
+        col_of = {col: index for index, col in enumerate(cols)}
+        for row, col, stone in self.history:
+            board.make_move(row_of[row], col_of[col], stone)
+        return board, rows, cols
+
+    def _window_lines(self, values: List[int], margin: int) -> List[int]:
+        # Sorted rows (or columns) within margin of one of the values, inside a bounded board
+        kept = set()
+        for value in set(values):
+            kept.update(range(value - margin, value + margin + 1))
+        return sorted(value for value in kept if self.size is None or 0 <= value < self.size)
+
+    def _pad_lines(self, lines: List[int], side: int) -> List[int]:
+        # The lines grown to `side` with the empty ones next to them, one at each end in turn
+        # (never past the edge of a bounded board)
+        lines = list(lines)
+        grow_low = False
+        while len(lines) < side:
+            low, high = lines[0] - 1, lines[-1] + 1
+            if self.in_bounds(low, 0) and (grow_low or not self.in_bounds(high, 0)):
+                lines.insert(0, low)
+            elif self.in_bounds(high, 0):
+                lines.append(high)
+            else:
+                # They span a bounded board from edge to edge, the first one left out goes in between
+                position = next(i for i in range(1, len(lines)) if lines[i] != lines[i - 1] + 1)
+                lines.insert(position, lines[position - 1] + 1)
+            grow_low = not grow_low
+        return lines
+
+    def copy(self) -> 'SparseBoard':
+        board = SparseBoard(self.size)
+        for row, col, stone in self.history:
+            board.make_move(row, col, stone)
+        return board
+
+    def _neighbourhood(self, row: int, col: int):
+        distance = self.CANDIDATE_DISTANCE
+        for r in range(row - distance, row + distance + 1):
+            for c in range(col - distance, col + distance + 1):
+                if self.in_bounds(r, c):
+                    yield r, c
+
+    def display(self):
+        # The area around the stones only, with absolute row numbers
+        bounds = self.bounds()
+        if bounds is None:
+            return
+        top, left, bottom, right = bounds
+        for row in range(top - 1, bottom + 2):
+            print(f"{row:4}", end=" ")
+            for col in range(left - 1, right + 2):
+                cell = self.get(row, col)
+                if cell == self.BLACK:
+                    print(" ●", end="")
+                elif cell == self.WHITE:
+                    print(" ○", end="")
+                else:
+                    print(" .", end="")
+            print()
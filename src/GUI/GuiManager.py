@@ -4,81 +4,146 @@ from GUI import UtilizationGui
 
 class Gui:
     # Measures are in px
-    BOARD_SIZE = 15  
     CELL_SIZE = 40
     MARGIN = 50
     PIECE_RADIUS = (CELL_SIZE // 2) - 2
-    WINDOW_SIZE = BOARD_SIZE * CELL_SIZE + 2 * MARGIN
 
-    # Avilable modes
-    _MODES = [
-        {"rect": pygame.Rect((WINDOW_SIZE-WINDOW_SIZE/2)/2, 200, WINDOW_SIZE/2, 80), "color": UtilizationGui.Constants.LIGHT_BLUE, "text": "Player vs Player"},
-        {"rect": pygame.Rect((WINDOW_SIZE-WINDOW_SIZE/2)/2, 300, WINDOW_SIZE/2, 80), "color": UtilizationGui.Constants.LIGHT_GREEN, "text": "Player vs AI "},
-        {"rect": pygame.Rect((WINDOW_SIZE-WINDOW_SIZE/2)/2, 400, WINDOW_SIZE/2, 80), "color": UtilizationGui.Constants.LIGHT_RED, "text": "AI vs AI"}
-    ]
+    def __init__(self, board_size=Board.Board.DIMENSIONS):
+        # The window grows with the board, e.g. 19 for a Go board
+        self.BOARD_SIZE = board_size
+        self.WINDOW_SIZE = board_size * self.CELL_SIZE + 2 * self.MARGIN
+
+        # Avilable modes. The menu is laid out in sevenths of the window (title in the first, one
+        # box in each of the next three), so it fits whatever the board size; 100 px on a 15x15 board
+        self._MENU_ROW = self.WINDOW_SIZE / 7
+        self._MENU_FONT_SIZE = max(12, round(36 * self.WINDOW_SIZE / 700))
+        box_x = (self.WINDOW_SIZE - self.WINDOW_SIZE / 2) / 2
+        box_height = 0.8 * self._MENU_ROW
+        self._MODES = [
+            {"rect": pygame.Rect(box_x, 2 * self._MENU_ROW, self.WINDOW_SIZE/2, box_height), "color": UtilizationGui.Constants.LIGHT_BLUE, "text": "Player vs Player", "mode": UtilizationGui.Constants.HUMAN_VS_HUMAN},
+            {"rect": pygame.Rect(box_x, 3 * self._MENU_ROW, self.WINDOW_SIZE/2, box_height), "color": UtilizationGui.Constants.LIGHT_GREEN, "text": "Player vs AI ", "mode": UtilizationGui.Constants.HUMAN_VS_AI},
+            {"rect": pygame.Rect(box_x, 4 * self._MENU_ROW, self.WINDOW_SIZE/2, box_height), "color": UtilizationGui.Constants.LIGHT_RED, "text": "AI vs AI", "mode": UtilizationGui.Constants.AI_VS_AI}
+        ]
 
-    def __init__(self):
         pygame.init()
         pygame.display.set_caption("Gomoku")
         self.screen = pygame.display.set_mode((self.WINDOW_SIZE, self.WINDOW_SIZE))
+
+        # Rendered once: fonts by (name, size), the empty board and one surface per stone colour
+        self._fonts = {}
+        self._board_surface = self._render_board()
+        self._stones = {Board.Board.BLACK: self._render_stone(UtilizationGui.Constants.BLACK, None),
+                        Board.Board.WHITE: self._render_stone(UtilizationGui.Constants.WHITE, UtilizationGui.Constants.BLACK)}
+
+        # Stones as last drawn, so update_board only touches the cells that changed, and the
+        # screen areas changed since the last present()
+        self._drawn = [[0] * self.BOARD_SIZE for _ in range(self.BOARD_SIZE)]
+        self._dirty = []
+        self._status = None
         self.draw_select_mode()
 
-    # A method to draw the lines and cover the old mode selection menu
-    def draw_board(self):
-        self.screen.fill(UtilizationGui.Constants.BROWN)
+    def font(self, name, size):
+        # name None is pygame's default font, anything else a system font
+        key = (name, size)
+        if key not in self._fonts:
+            self._fonts[key] = pygame.font.Font(None, size) if name is None else pygame.font.SysFont(name, size)
+        return self._fonts[key]
+
+    def _render_board(self):
+        surface = pygame.Surface((self.WINDOW_SIZE, self.WINDOW_SIZE))
+        surface.fill(UtilizationGui.Constants.BROWN)
         for i in range(self.BOARD_SIZE+1):
-            pygame.draw.line(self.screen, UtilizationGui.Constants.BLACK, 
+            pygame.draw.line(surface, UtilizationGui.Constants.BLACK, 
                             (self.MARGIN, self.MARGIN + i * self.CELL_SIZE), 
                             (self.WINDOW_SIZE - self.MARGIN, self.MARGIN + i * self.CELL_SIZE), 2)
-            pygame.draw.line(self.screen, UtilizationGui.Constants.BLACK, 
+            pygame.draw.line(surface, UtilizationGui.Constants.BLACK, 
                             (self.MARGIN + i * self.CELL_SIZE, self.MARGIN), 
                             (self.MARGIN + i * self.CELL_SIZE, self.WINDOW_SIZE - self.MARGIN), 2)
         center = self.BOARD_SIZE // 2
-        pygame.draw.circle(self.screen, UtilizationGui.Constants.BLACK, 
+        pygame.draw.circle(surface, UtilizationGui.Constants.BLACK, 
                         (self.MARGIN + center * self.CELL_SIZE, self.MARGIN + center * self.CELL_SIZE), 5)
+        return surface
+
+    def _render_stone(self, color, outline):
+        size = 2 * self.PIECE_RADIUS + 1
+        surface = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(surface, color, (self.PIECE_RADIUS, self.PIECE_RADIUS), self.PIECE_RADIUS)
+        if outline is not None:
+            pygame.draw.circle(surface, outline, (self.PIECE_RADIUS, self.PIECE_RADIUS), self.PIECE_RADIUS, 1)
+        return surface
+
+    def _cell_rect(self, row, col):
+        return pygame.Rect(self.MARGIN + col * self.CELL_SIZE - self.PIECE_RADIUS,
+                           self.MARGIN + row * self.CELL_SIZE - self.PIECE_RADIUS,
+                           2 * self.PIECE_RADIUS + 1, 2 * self.PIECE_RADIUS + 1)
+
+    def invalidate(self):
+        # The whole window has to go out again, e.g. after it was uncovered
+        self._dirty = [self.screen.get_rect()]
+
+    def present(self):
+        # Sends only the changed areas to the display, nothing at all when idle
+        if self._dirty:
+            pygame.display.update(self._dirty)
+            self._dirty = []
+
+    # A method to draw the lines and cover the old mode selection menu
+    def draw_board(self):
+        self.screen.blit(self._board_surface, (0, 0))
+        self._drawn = [[0] * self.BOARD_SIZE for _ in range(self.BOARD_SIZE)]
+        self.invalidate()
         
     def draw_select_mode(self):
         self.screen.fill(UtilizationGui.Constants.WHITE)
-        title = pygame.font.SysFont('Arial', 36).render("Select Gomoku Game Mode", True, UtilizationGui.Constants.BLACK)
-        self.screen.blit(title, (self.WINDOW_SIZE//2 - title.get_width()//2, 100))
+        title = self.font('Arial', self._MENU_FONT_SIZE).render("Select Gomoku Game Mode", True, UtilizationGui.Constants.BLACK)
+        self.screen.blit(title, (self.WINDOW_SIZE//2 - title.get_width()//2, self._MENU_ROW))
         
         # Draw mode boxes
         for box in self._MODES:
             pygame.draw.rect(self.screen, box["color"], box["rect"])
             pygame.draw.rect(self.screen, UtilizationGui.Constants.BLACK, box["rect"], 2)  # Border
             
-            text = pygame.font.SysFont('Arial', 36).render(box["text"], True, UtilizationGui.Constants.BLACK)
+            text = self.font('Arial', self._MENU_FONT_SIZE).render(box["text"], True, UtilizationGui.Constants.BLACK)
             text_rect = text.get_rect(center=box["rect"].center)
             self.screen.blit(text, text_rect)
+        self.invalidate()
 
     def select_mode(self, pos):
-        x, y = pos
-        # Dyncamically getting rectangles dimensions from modes
-        if(x >= (self.WINDOW_SIZE-self.WINDOW_SIZE/2)/2 and x <= (self.WINDOW_SIZE-self.WINDOW_SIZE/2)/2 + self.WINDOW_SIZE/2):
-            if(y >= self._MODES[0]["rect"][1] and y <= self._MODES[0]["rect"][1] + self._MODES[0]["rect"][3]):
-                return UtilizationGui.Constants.HUMAN_VS_HUMAN
-            if(y >= self._MODES[1]["rect"][1] and y <= self._MODES[1]["rect"][1] + self._MODES[2]["rect"][3]):
-                return UtilizationGui.Constants.HUMAN_VS_AI
-            if(y >= self._MODES[2]["rect"][1] and y <= self._MODES[2]["rect"][1] + self._MODES[2]["rect"][3]):
-                return UtilizationGui.Constants.AI_VS_AI
+        # The box under the click, the rectangles follow the window size
+        for box in self._MODES:
+            if box["rect"].collidepoint(pos):
+                return box["mode"]
             
         return UtilizationGui.Constants.INVALID_MODE
 
     def update_board(self, board):
         for row in range(self.BOARD_SIZE):
             for col in range(self.BOARD_SIZE):
-                if board[row][col] == Board.Board.BLACK:
-                    pygame.draw.circle(self.screen, UtilizationGui.Constants.BLACK, 
-                                    (self.MARGIN + col * self.CELL_SIZE, self.MARGIN + row * self.CELL_SIZE), 
-                                    self.PIECE_RADIUS)
-                    
-                elif board[row][col] == Board.Board.WHITE:
-                    pygame.draw.circle(self.screen, UtilizationGui.Constants.WHITE, 
-                                    (self.MARGIN + col * self.CELL_SIZE, self.MARGIN + row * self.CELL_SIZE), 
-                                    self.PIECE_RADIUS)
-                    pygame.draw.circle(self.screen, UtilizationGui.Constants.BLACK, 
-                                    (self.MARGIN + col * self.CELL_SIZE, self.MARGIN + row * self.CELL_SIZE), 
-                                    self.PIECE_RADIUS, 1)
+                stone = board[row][col]
+                if stone == self._drawn[row][col]:
+                    continue
+                rect = self._cell_rect(row, col)
+                # The empty board under the cell first, so a taken back stone disappears too
+                self.screen.blit(self._board_surface, rect, rect)
+                if stone in self._stones:
+                    self.screen.blit(self._stones[stone], rect)
+                self._drawn[row][col] = stone
+                self._dirty.append(rect)
+
+    # Status line in the bottom margin, e.g. while the AI thinks
+    def show_thinking(self, text):
+        if text == self._status:
+            return
+        self.clear_thinking()
+        self._status = text
+        status = self.font(None, 28).render(text, True, UtilizationGui.Constants.BLACK)
+        self.screen.blit(status, status.get_rect(center=(self.WINDOW_SIZE // 2, self.WINDOW_SIZE - self.MARGIN // 2)))
+
+    def clear_thinking(self):
+        rect = pygame.Rect(0, self.WINDOW_SIZE - self.MARGIN + 2, self.WINDOW_SIZE, self.MARGIN - 2)
+        self.screen.blit(self._board_surface, rect, rect)
+        self._dirty.append(rect)
+        self._status = None
 
     def convert_pos_to_index(self, pos):
         x,y = pos
@@ -87,7 +152,7 @@ class Gui:
         return col, row
     
     def show_game_over(self, state):
-        font = pygame.font.Font(None, 36)
+        font = self.font(None, 36)
 
         if(state == Manager.Manager.DRAW):
             text = font.render("DRAW!", True, UtilizationGui.Constants.BLACK)
@@ -98,4 +163,5 @@ class Gui:
 
         text_rect = text.get_rect(center=(self.WINDOW_SIZE//2, self.WINDOW_SIZE//2))
         pygame.draw.rect(self.screen, UtilizationGui.Constants.WHITE, text_rect.inflate(20, 20))
-        self.screen.blit(text, text_rect)
\ No newline at end of file
+        self.screen.blit(text, text_rect)
+        self._dirty.append(text_rect.inflate(20, 20))
\ No newline at end of file
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from Engine.Manager import Manager
+from Tools.Percentiles import percentile
+
+# Stand-in client of Server/GameServer.py: opens many connections at once and plays a simple
+# opponent against the AI on each, then reports the results and the response times. Run from
+# src/ with the server running, e.g.
+#   python -m Server.GameClient --port 8765 --games 200 --concurrency 50
+
+
+class GameClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = 8765) -> 'GameClient':
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, op: str, **fields) -> Dict:
+        """
+        Args:
+            op: Request name, e.g. 'new' or 'play'
+            **fields: The other fields of the request
+
+        Returns:
+            The server's response
+        """
+        request = dict(id=next(self._ids), op=op, **fields)
+        self._writer.write(json.dumps(request).encode() + b'\n')
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("the server closed the connection")
+        return json.loads(line)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def _reply(taken: Set[Tuple[int, int]], size: int, rng: random.Random) -> Tuple[int, int]:
+    # A random free cell next to a stone, the center on an empty board
+    if not taken:
+        return size // 2, size // 2
+    row, col = rng.choice(sorted(taken))
+    near = [(row + dr, col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+    near = [cell for cell in near if cell not in taken and 0 <= cell[0] < size and 0 <= cell[1] < size]
+    if near:
+        return rng.choice(near)
+    return rng.choice([(r, c) for r in range(size) for c in range(size) if (r, c) not in taken])
+
+
+async def play_game(client: GameClient, settings: Dict, rng: random.Random, latencies: List[float]) -> Dict:
+    """
+    Args:
+        client: Connected client
+        settings: Fields of the new request (size, ai_stone, depth, time_ms)
+        rng: Random source of the stand-in player
+        latencies: Response times (ms) of the play requests are appended here
+
+    Returns:
+        Dictionary with the result and the number of moves and busy answers
+    """
+    busy = 0
+    while True:
+        response = await client.request('new', **settings)
+        if response['ok']:
+            break
+        if response['error'] != 'busy':
+            raise RuntimeError(response['error'])
+        busy += 1
+    game, size = response['game'], settings.get('size', 15)
+    taken = set()
+    if response['ai_move']:
+        taken.add(tuple(response['ai_move']))
+
+    result = response['result']
+    while result == 0:
+        move = _reply(taken, size, rng)
+        start = time.perf_counter()
+        response = await client.request('play', game=game, row=move[0], col=move[1])
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not response['ok']:
+            if response['error'] != 'busy':
+                raise RuntimeError(response['error'])
+            busy += 1
+            await asyncio.sleep(0.05)
+            continue
+        taken.add(move)
+        if response['ai_move']:
+            taken.add(tuple(response['ai_move']))
+        result = response['result']
+
+    await client.request('close', game=game)
+    return {'result': result, 'moves': len(taken), 'busy': busy}
+
+
+async def run(host: str, port: int, games: int, concurrency: int, settings: Dict, seed: int) -> Dict:
+    queue = list(range(games))
+    results = []
+    latencies = []
+
+    async def player():
+        client = await GameClient.connect(host, port)
+        try:
+            while queue:
+                index = queue.pop()
+                results.append(await play_game(client, settings, random.Random(seed * 1000003 + index), latencies))
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player() for _ in range(min(concurrency, games))))
+    elapsed = time.perf_counter() - start
+
+    client = await GameClient.connect(host, port)
+    stats = await client.request('stats')
+    await client.close()
+
+    ai_stone = settings.get('ai_stone', 2)
+    ai_win = Manager.BLACK_WIN if ai_stone == 1 else Manager.WHITE_WIN
+    return {'games': len(results), 'seconds': round(elapsed, 2),
+            'ai_wins': sum(game['result'] == ai_win for game in results),
+            'draws': sum(game['result'] == Manager.DRAW for game in results),
+            'busy_answers': sum(game['busy'] for game in results),
+            'moves': sum(game['moves'] for game in results),
+            'play_ms': {'p50': percentile(latencies, 0.5), 'p90': percentile(latencies, 0.9),
+                        'p99': percentile(latencies, 0.99), 'max': max(latencies, default=0.0)},
+            'server': stats}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Play many stand-in games against a running GameServer")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10, help='Connections playing at once')
+    parser.add_argument('--size', type=int, default=15)
+    parser.add_argument('--ai-stone', type=int, default=2)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--time-ms', type=float, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    settings = {'size': args.size, 'ai_stone': args.ai_stone, 'depth': args.depth, 'time_ms': args.time_ms}
+    report = asyncio.run(run(args.host, args.port, args.games, args.concurrency, settings, args.seed))
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from Engine.Board import Board
+from Engine.Manager import Manager
+from Engine.GameRecord import GameRecordWriter, UNFINISHED
+from AI.AI import AI
+
+# Local game server: many clients play against the AI at once over TCP. The protocol is JSON
+# lines, one request and one response per line:
+#
+#   {"id": 1, "op": "new", "size": 15, "ai_stone": 2, "depth": 2, "time_ms": 1000}
+#       -> {"id": 1, "ok": true, "game": 7, "to_move": 1, "ai_move": null, "result": 0}
+#   {"id": 2, "op": "play", "game": 7, "row": 7, "col": 7}
+#       -> {"id": 2, "ok": true, "result": 0, "ai_move": [6, 6], "ai_depth": 3, "ai_ms": 412.0}
+#   {"op": "state", "game": 7}, {"op": "close", "game": 7}, {"op": "stats"}
+#   errors -> {"id": ..., "ok": false, "error": "..."}, "busy" means try again later
+#
+# Results are Manager's: 0 still playing, Manager.DRAW / BLACK_WIN / WHITE_WIN once it is over.
+# The AI searches run in a process pool, so the event loop only ever parses, checks moves and
+# waits. No more searches are started than there are workers; a request that finds them all taken
+# waits for one up to queue_ms and is then answered "busy". Every connection handles one request
+# at a time, so a client that sends faster than it is served is held back by TCP itself.
+# Run from src/, e.g.
+#   python -m Server.GameServer --port 8765 --workers 4
+#   python -m Server.GameClient --port 8765 --games 200 --concurrency 50
+
+
+class GameError(Exception):
+    # A request that cannot be served, its message is sent back to the client
+    pass
+
+
+class Session:
+    # Every game the server knows about. Idle games are only this: the moves as packed cell indices
+    # (2 bytes each) and the settings, a Board and Manager are only kept for the recently used ones
+    __slots__ = ('id', 'size', 'ai_stone', 'depth', 'time_ms', 'moves', 'result', 'busy', 'last_active')
+
+    def __init__(self, session_id: int, size: int, ai_stone: int, depth: int, time_ms: Optional[float]):
+        self.id = session_id
+        self.size = size
+        self.ai_stone = ai_stone
+        self.depth = depth
+        self.time_ms = time_ms
+        self.moves = array('H')
+        self.result = 0
+        self.busy = False
+        self.last_active = time.monotonic()
+
+    @property
+    def to_move(self) -> int:
+        return Board.BLACK if len(self.moves) % 2 == 0 else Board.WHITE
+
+    def history(self) -> List[Tuple[int, int, int]]:
+        # Moves as (row, col, stone), black first
+        size = self.size
+        return [(cell // size, cell % size, Board.BLACK if ply % 2 == 0 else Board.WHITE)
+                for ply, cell in enumerate(self.moves)]
+
+
+# Per worker process state: one AI per board size, colour and depth, kept so its tables stay warm
+_ais = {}
+
+
+def search_move(size: int, history: List[Tuple[int, int, int]], stone: int, depth: int,
+                time_ms: Optional[float]) -> Tuple[Tuple[int, int], int, float]:
+    """
+    Args:
+        size: Size of the board
+        history: Moves of the position as (row, col, stone)
+        stone: Stone value of the AI, to move
+        depth: Search depth (the deepest iteration when there is a time limit)
+        time_ms: Time budget of the move, None to search to depth
+
+    Returns:
+        Tuple of (move, depth reached, search time in ms)
+    """
+    key = (size, stone, depth)
+    ai = _ais.get(key)
+    if ai is None:
+        ai = _ais[key] = AI(board_size=size, player_stone=stone, opponent_stone=3 - stone, max_depth=depth)
+    board = Board(size)
+    for row, col, placed in history:
+        board.make_move(row, col, placed)
+
+    start = time.perf_counter()
+    move = ai.ai_move(board, time_limit_ms=time_ms, max_depth=depth)
+    return move, ai.last_depth, (time.perf_counter() - start) * 1000
+
+
+class GameServer:
+    # Limits of what a client may ask for
+    MAX_SIZE = 25
+    MAX_DEPTH = 6
+    MAX_TIME_MS = 30000
+
+    def __init__(self, workers: Optional[int] = None, queue_ms: float = 2000, live_boards: int = 256,
+                 idle_s: float = 900, default_depth: int = 2, default_time_ms: Optional[float] = 1000,
+                 records: Optional[str] = None):
+        """
+        Args:
+            workers: Number of search processes (defaults to the number of CPUs), also the most searches running at once
+            queue_ms: How long a move waits for a free worker before it is answered "busy"
+            live_boards: Number of games that keep their Board and Manager between requests,
+                the others are rebuilt from their moves when they are played again
+            idle_s: Games untouched for this long are dropped (recorded as unfinished)
+            default_depth: Search depth of games that do not ask for one
+            default_time_ms: Time per AI move of games that do not ask for one (None for no limit)
+            records: Game record file (Engine/GameRecord.py) finished and dropped 15x15 games are appended to
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_ms = queue_ms
+        self.live_boards = live_boards
+        self.idle_s = idle_s
+        self.default_depth = default_depth
+        self.default_time_ms = default_time_ms
+
+        self.sessions: Dict[int, Session] = {}
+        self._next_id = 1
+        self._live: 'OrderedDict[int, Manager]' = OrderedDict()
+        self._recorder = GameRecordWriter(records) if records else None
+
+        self._pool = ProcessPoolExecutor(self.workers)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._server = None
+        self._sweeper = None
+
+        # Counters for the stats request
+        self.requests = 0
+        self.searches = 0
+        self.searching = 0
+        self.rejected = 0
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self._serve_client, host, port)
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        self._pool.shutdown(cancel_futures=True)
+        if self._recorder is not None:
+            for session in self.sessions.values():
+                self._record(session)
+            self._recorder.close()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_line(line)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # ValueError: a line over the stream limit, nothing sensible can follow it
+            pass
+        finally:
+            writer.close()
+
+    async def handle_line(self, line: bytes) -> Dict:
+        """
+        Args:
+            line: One request as JSON
+
+        Returns:
+            The response, with the request's id (if it had one) and ok
+        """
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise GameError("a request is a JSON object")
+            request_id = request.get('id')
+            op = request.get('op')
+            handler = self._OPS.get(op) if isinstance(op, str) else None
+            if handler is None:
+                raise GameError(f"unknown op {request.get('op')!r}, expected one of {sorted(self._OPS)}")
+            response = await handler(self, request)
+        except GameError as error:
+            response = {'ok': False, 'error': str(error)}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            response = {'ok': False, 'error': "invalid JSON"}
+        except Exception as error:
+            # A bug (or a dead worker) fails the request, not the connection or the server
+            response = {'ok': False, 'error': f"internal error: {error!r}"}
+        else:
+            response = dict(ok=True, **response)
+        return dict(id=request_id, **response)
+
+    async def op_new(self, request: Dict) -> Dict:
+        size = _int_field(request, 'size', Board.DIMENSIONS, 5, self.MAX_SIZE)
+        ai_stone = _int_field(request, 'ai_stone', Board.WHITE, Board.BLACK, Board.WHITE)
+        depth = _int_field(request, 'depth', self.default_depth, 1, self.MAX_DEPTH)
+        time_ms = request.get('time_ms', self.default_time_ms)
+        if time_ms is not None and (not isinstance(time_ms, (int, float)) or isinstance(time_ms, bool)
+                                    or not 0 < time_ms <= self.MAX_TIME_MS):
+            raise GameError(f"time_ms must be a number of ms up to {self.MAX_TIME_MS} or null")
+
+        session = Session(self._next_id, size, ai_stone, depth, time_ms)
+        self._next_id += 1
+        response = {'game': session.id, 'ai_move': None}
+        if ai_stone == Board.BLACK:
+            # The game is only kept once the AI has opened it, a client told "busy" starts a new one
+            try:
+                response.update(await self._ai_reply(session))
+            except Exception:
+                self._live.pop(session.id, None)
+                raise
+        self.sessions[session.id] = session
+        response.update(result=session.result, to_move=session.to_move)
+        return response
+
+    async def op_play(self, request: Dict) -> Dict:
+        session = self._session(request)
+        if session.result != 0:
+            raise GameError("the game is over")
+        if session.to_move == session.ai_stone:
+            raise GameError("it is the AI's move")
+        row = _int_field(request, 'row', None, 0, session.size - 1)
+        col = _int_field(request, 'col', None, 0, session.size - 1)
+
+        manager = self._manager(session)
+        result = manager.play(row, col, session.to_move)
+        if result == -1:
+            raise GameError(f"{(row, col)} is taken")
+        session.moves.append(row * session.size + col)
+        session.result = result
+        response = {'ai_move': None}
+        if result == 0:
+            try:
+                response.update(await self._ai_reply(session))
+            except Exception:
+                # Nothing changed as far as the client can tell, it may simply play the move again
+                manager.board.unmake_move()
+                session.moves.pop()
+                raise
+        response.update(result=session.result, to_move=session.to_move)
+        return response
+
+    async def op_state(self, request: Dict) -> Dict:
+        session = self._session(request)
+        return {'game': session.id, 'size': session.size, 'ai_stone': session.ai_stone,
+                'moves': [[row, col] for row, col, _ in session.history()],
+                'to_move': session.to_move, 'result': session.result}
+
+    async def op_close(self, request: Dict) -> Dict:
+        session = self._session(request)
+        self._drop(session)
+        return {'game': session.id}
+
+    async def op_stats(self, request: Dict) -> Dict:
+        return {'sessions': len(self.sessions), 'live_boards': len(self._live), 'workers': self.workers,
+                'searching': self.searching, 'searches': self.searches, 'requests': self.requests,
+                'rejected_busy': self.rejected}
+
+    _OPS = {'new': op_new, 'play': op_play, 'state': op_state, 'close': op_close, 'stats': op_stats}
+
+    def _session(self, request: Dict) -> Session:
+        game = request.get('game')
+        # Only hashable ids can be looked up, a list or object is as unknown as a wrong number
+        valid = isinstance(game, (int, str)) and not isinstance(game, bool)
+        session = self.sessions.get(game) if valid else None
+        if session is None:
+            raise GameError(f"no game {request.get('game')!r}")
+        if session.busy:
+            raise GameError("the game is busy with the AI's move")
+        session.last_active = time.monotonic()
+        return session
+
+    def _manager(self, session: Session) -> Manager:
+        # The Board and Manager of a game, rebuilt from its moves if they were let go
+        manager = self._live.get(session.id)
+        if manager is None:
+            board = Board(session.size)
+            for row, col, stone in session.history():
+                board.make_move(row, col, stone)
+            manager = Manager(board, self._recorder if session.size == Board.DIMENSIONS else None)
+            self._live[session.id] = manager
+            while len(self._live) > self.live_boards:
+                self._live.popitem(last=False)
+        else:
+            self._live.move_to_end(session.id)
+        return manager
+
+    async def _ai_reply(self, session: Session) -> Dict:
+        # Searches and plays the AI's move, raises GameError "busy" if no worker got free in time.
+        # The game is busy meanwhile, other requests for it are turned away
+        session.busy = True
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_ms / 1000)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise GameError("busy")
+            self.searching += 1
+            try:
+                # The search keeps to the game's time_ms itself (ai_move's deadline)
+                loop = asyncio.get_running_loop()
+                (row, col), depth, elapsed = await loop.run_in_executor(
+                    self._pool, search_move, session.size, session.history(), session.ai_stone,
+                    session.depth, session.time_ms)
+            finally:
+                self.searching -= 1
+                self._slots.release()
+        finally:
+            session.busy = False
+        self.searches += 1
+
+        manager = self._manager(session)
+        session.result = manager.play(row, col, session.ai_stone)
+        session.moves.append(row * session.size + col)
+        session.last_active = time.monotonic()
+        return {'ai_move': [row, col], 'ai_depth': depth, 'ai_ms': round(elapsed, 3)}
+
+    def _drop(self, session: Session):
+        self._record(session)
+        self._live.pop(session.id, None)
+        del self.sessions[session.id]
+
+    def _record(self, session: Session):
+        # Finished games were written by their Manager, the others are written as unfinished
+        if self._recorder is not None and session.result == 0 and session.moves and session.size == Board.DIMENSIONS:
+            self._recorder.write_game(session.history(), UNFINISHED)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(min(10.0, max(1.0, self.idle_s / 4)))
+            deadline = time.monotonic() - self.idle_s
+            for session in [s for s in self.sessions.values() if s.last_active < deadline and not s.busy]:
+                self._drop(session)
+            if self._recorder is not None:
+                self._recorder.flush()
+
+
+def _int_field(request: Dict, name: str, default: Optional[int], low: int, high: int) -> int:
+    value = request.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+        raise GameError(f"{name} must be an integer from {low} to {high}")
+    return value
+
+
+async def serve(args):
+    server = GameServer(args.workers, args.queue_ms, args.live_boards, args.idle_s, args.depth,
+                        args.time_ms, args.records)
+    listener = await server.start(args.host, args.port)
+    print(f"serving on {', '.join(str(sock.getsockname()) for sock in listener.sockets)} "
+          f"with {server.workers} search workers", file=sys.stderr)
+    # A terminated server still records its games
+    serving = asyncio.ensure_future(listener.serve_forever())
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+    try:
+        await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await server.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve games against the AI over TCP (JSON lines)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help='Search processes, the most searches at once')
+    parser.add_argument('--queue-ms', type=float, default=2000, help='Wait for a free worker before answering busy')
+    parser.add_argument('--live-boards', type=int, default=256, help='Games that keep their Board between requests')
+    parser.add_argument('--idle-s', type=float, default=900, help='Drop games untouched for this long')
+    parser.add_argument('--depth', type=int, default=2, help='Search depth of games that do not ask for one')
+    parser.add_argument('--time-ms', type=float, default=1000, help='Time per AI move of games that do not ask for one')
+    parser.add_argument('--records', default=None, help='Append the games (15x15) to this game record file')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
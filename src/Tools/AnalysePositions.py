@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from Engine.Board import Board
+from Engine.GameRecord import GameRecordReader, is_record_file
+from AI.AI import AI
+
+# Offline analysis of positions and game archives: reads records one line at a time from a file or
+# stdin, searches every position on a process pool and writes one line of JSON per position, in
+# input order. Only a bounded number of positions is in flight, so archives of any size stream
+# through in constant memory. No pygame needed. Run from src/, e.g.
+#   python -m Tools.AnalysePositions games.jsonl --depth 3 --every-ply > analysis.jsonl
+#   cat positions.txt | python -m Tools.AnalysePositions --workers 4
+#
+# A record is one line, either
+#   JSON: {"id": ..., "size": 15, "moves": [[row, col], ...]} (a Tournament game with its
+#         [row, col, stone] moves works as is), or just the list of moves
+#   text: row,col pairs separated by spaces, e.g. "7,7 8,8 7,8"
+# Stones alternate starting with black unless the moves give them. Blank lines and lines starting
+# with # are skipped. A binary game record file (Engine/GameRecord.py) is read game by game
+# instead, the id of a game is its number in the file.
+
+
+# Largest board a record may ask for, a dense Board takes a moment to set up even at this size
+MAX_SIZE = 100
+
+
+class RecordError(ValueError):
+    # A line that is not a valid record, reported in the output instead of stopping the run
+    pass
+
+
+def _is_int(value) -> bool:
+    # bool is an int subclass, but true is no board coordinate
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_record(line: str, number: int, default_size: int) -> Dict:
+    """
+    Args:
+        line: One line of input
+        number: Line number, the id of a record that has none
+        default_size: Board size of a record that has none
+
+    Returns:
+        Dictionary with the id, board size and moves as (row, col, stone) of the record
+    """
+    text = line.strip()
+    record = {'id': number, 'size': default_size}
+    if text.startswith('{') or text.startswith('['):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as error:
+            raise RecordError(f"invalid JSON: {error}")
+        if isinstance(data, dict):
+            record['id'] = data.get('id', data.get('index', number))
+            record['size'] = data.get('size', default_size)
+            moves = data.get('moves')
+        else:
+            moves = data
+        if not isinstance(moves, list):
+            raise RecordError("no list of moves")
+    else:
+        try:
+            moves = [[int(value) for value in pair.split(',')] for pair in text.split()]
+        except ValueError:
+            raise RecordError(f"expected row,col pairs, got {text[:40]!r}")
+    if not _is_int(record['size']) or not 1 <= record['size'] <= MAX_SIZE:
+        raise RecordError(f"invalid board size {record['size']!r}, expected 1 to {MAX_SIZE}")
+
+    board = Board(record['size'])
+    stone = Board.BLACK
+    checked = []
+    for move in moves:
+        if not isinstance(move, (list, tuple)) or len(move) not in (2, 3) or not all(_is_int(value) for value in move):
+            raise RecordError(f"move {len(checked) + 1} {move!r} is not [row, col] or [row, col, stone] of integers")
+        row, col = move[0], move[1]
+        stone = move[2] if len(move) == 3 else stone
+        if stone not in (Board.BLACK, Board.WHITE):
+            raise RecordError(f"move {len(checked) + 1} has stone {stone}, expected {Board.BLACK} or {Board.WHITE}")
+        if not board.in_bounds(row, col) or board.get(row, col) != 0:
+            raise RecordError(f"move {len(checked) + 1} {(row, col)} is off the board or on a stone")
+        board.make_move(row, col, stone)
+        checked.append((row, col, stone))
+        stone = 3 - stone
+    record['moves'] = checked
+    return record
+
+
+def positions(lines: Iterable[str], size: int, every_ply: bool) -> Iterator[Tuple]:
+    """
+    Args:
+        lines: Input lines, read lazily
+        size: Board size of the records that do not give one
+        every_ply: Analyse the position after every move of a record, not only the last one
+
+    Yields:
+        Tasks for analyse_position, (id, ply, size, moves) or (id, error message) for a bad line
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        try:
+            record = parse_record(line, number, size)
+        except RecordError as error:
+            yield number, str(error)
+            continue
+        moves = record['moves']
+        first = 0 if every_ply else len(moves)
+        for ply in range(first, len(moves) + 1):
+            yield record['id'], ply, record['size'], moves[:ply]
+
+
+def record_positions(reader: GameRecordReader, every_ply: bool) -> Iterator[Tuple]:
+    # The same tasks as positions, from a game record file
+    for number, game in enumerate(reader):
+        moves = game.moves
+        first = 0 if every_ply else len(moves)
+        for ply in range(first, len(moves) + 1):
+            yield number, ply, reader.board_size, moves[:ply]
+
+
+# Per worker process state, set up by _init_worker
+_config = None
+_ais = {}
+
+
+def _init_worker(config: Dict):
+    global _config, _ais
+    _config = config
+    _ais = {}
+
+
+def _worker_ai(size: int, stone: int) -> AI:
+    # One AI per board size and colour, kept for the whole run so its tables stay warm
+    ai = _ais.get((size, stone))
+    if ai is None:
+        ai = AI(board_size=size, player_stone=stone, opponent_stone=3 - stone, max_depth=_config['depth'],
+                threat_depth=_config['threat_depth'], opening_book=_config['opening_book'])
+        _ais[(size, stone)] = ai
+    return ai
+
+
+def _json_score(score: Optional[float]):
+    # JSON has no infinity, forced results are written as "win" / "loss"
+    if score == float('inf'):
+        return 'win'
+    if score == float('-inf'):
+        return 'loss'
+    return score
+
+
+def analyse_position(task: Tuple) -> Dict:
+    """
+    Args:
+        task: (id, ply, size, moves) from positions, or (id, error message)
+
+    Returns:
+        Dictionary of the analysis: the best move for the side to move, its searched score
+        (None when the move needed no search), the static evaluation after the move
+        (AI._evaluate_board), the depth searched, the nodes and the time
+    """
+    if len(task) == 2:
+        return {'id': task[0], 'error': task[1]}
+    record_id, ply, size, moves = task
+    board = Board(size)
+    for row, col, stone in moves:
+        board.make_move(row, col, stone)
+    stone = 3 - moves[-1][2] if moves else Board.BLACK
+    result = {'id': record_id, 'ply': ply, 'to_move': stone}
+
+    for player in (Board.BLACK, Board.WHITE):
+        if board.has_five(player):
+            result.update(move=None, winner=player)
+            return result
+    if board.is_full():
+        result.update(move=None, winner=0)
+        return result
+
+    ai = _worker_ai(size, stone)
+    nodes = ai.nodes
+    start = time.perf_counter()
+    if _config['time_ms'] is not None:
+        move = ai.ai_move(board, time_limit_ms=_config['time_ms'])
+        depth = ai.last_depth
+    else:
+        move = ai.ai_move_with_pruning(board)
+        depth = ai.max_depth if ai.nodes > nodes else 0
+    elapsed = (time.perf_counter() - start) * 1000
+
+    # The root entry of the table holds the search's score for the move it chose
+    entry = ai.tt.probe(ai._tt_key(board, True))
+    score = entry[2] if entry is not None and entry[4] == move else None
+    ai._make_move(board, move[0], move[1], stone)
+    evaluation = ai._evaluate_board(board)
+    ai._unmake_move(board)
+
+    result.update(move=list(move), score=_json_score(score), eval=_json_score(evaluation), depth=depth,
+                  nodes=ai.nodes - nodes, time_ms=round(elapsed, 3))
+    return result
+
+
+def analyse(tasks: Iterable[Tuple], config: Dict, workers: int, in_flight: int) -> Iterator[Dict]:
+    """
+    Args:
+        tasks: Tasks from positions
+        config: depth, time_ms, threat_depth and opening_book of the workers' AIs
+        workers: Number of worker processes
+        in_flight: Most positions submitted but not yet written, bounds the memory use
+
+    Yields:
+        analyse_position results in the order of the tasks
+    """
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(config,)) as executor:
+        pending = deque()
+        for task in tasks:
+            # Waiting on the oldest keeps the order, the others keep running meanwhile
+            if len(pending) >= in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(analyse_position, task))
+        while pending:
+            yield pending.popleft().result()
+
+
+def _open_input(path: str) -> TextIO:
+    return sys.stdin if path == '-' else open(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse positions and game records offline, one JSON line per position")
+    parser.add_argument('input', nargs='?', default='-', help='Records file, - (the default) for stdin')
+    parser.add_argument('--out', default=None, help='Output file (JSON lines), stdout if not given')
+    parser.add_argument('--depth', type=int, default=2, help='Search depth (the maximum with --time-ms)')
+    parser.add_argument('--time-ms', type=float, default=None, help='Time per position, iterative deepening instead of a fixed depth')
+    parser.add_argument('--threat-depth', type=int, default=8)
+    parser.add_argument('--opening-book', default=None)
+    parser.add_argument('--size', type=int, default=Board.DIMENSIONS, help='Board size of records that do not give one')
+    parser.add_argument('--every-ply', action='store_true', help='Analyse every position of a game, not only the last one')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--in-flight', type=int, default=None, help='Positions queued at most (defaults to 4 per worker)')
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    config = {'depth': args.depth, 'time_ms': args.time_ms, 'threat_depth': args.threat_depth,
+              'opening_book': args.opening_book}
+
+    start = time.perf_counter()
+    count = errors = 0
+    if args.input != '-' and is_record_file(args.input):
+        source = GameRecordReader(args.input)
+        tasks = record_positions(source, args.every_ply)
+    else:
+        source = _open_input(args.input)
+        tasks = positions(source, args.size, args.every_ply)
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        for result in analyse(tasks, config, workers, args.in_flight or 4 * workers):
+            out.write(json.dumps(result) + '\n')
+            count += 1
+            errors += 'error' in result
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        else:
+            out.flush()
+
+    print(f"{count} positions ({errors} bad records) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from Engine.Board import Board
+from AI.AI import AI
+
+# Benchmarks of the search and evaluation hot paths on a fixed set of positions. The report is
+# JSON; saved as a baseline it is what later runs are checked against (time, nodes and moves).
+# Run from src/, e.g.
+#   python -m Tools.Benchmark --save-baseline baseline.json      (before a change)
+#   python -m Tools.Benchmark --baseline baseline.json           (after it, exits 1 on a regression)
+# Timings only compare on the same machine, record the baseline where the check will run.
+# Every run also checks that alpha-beta plays moves the plain minimax scores as high as its own
+# at the same depth, and exits 1 if it does not.
+
+# Positions as moves (row, col, stone), black moved first so the history decides who is to move
+POSITIONS = {
+    'opening_1': [(7, 7, 1)],
+    'opening_2': [(7, 7, 1), (8, 8, 2)],
+    'opening_3': [(7, 7, 1), (7, 8, 2), (8, 7, 1)],
+    'middle_a': [(7, 7, 1), (6, 8, 2), (6, 6, 1), (5, 5, 2), (7, 6, 1), (7, 8, 2), (8, 8, 1), (9, 9, 2),
+                 (7, 5, 1), (7, 4, 2)],
+    'middle_b': [(7, 7, 1), (8, 8, 2), (6, 8, 1), (5, 9, 2), (6, 7, 1), (8, 7, 2), (8, 6, 1), (9, 5, 2),
+                 (5, 7, 1), (4, 7, 2)],
+    'middle_c': [(7, 7, 1), (8, 8, 2), (6, 8, 1), (5, 9, 2), (6, 7, 1), (8, 7, 2), (8, 6, 1), (9, 5, 2),
+                 (5, 7, 1), (4, 7, 2), (6, 6, 1), (6, 5, 2), (7, 5, 1), (4, 8, 2)],
+    # Black to move must stop white's forced line
+    'near_win_defend': [(7, 7, 1), (6, 8, 2), (6, 6, 1), (5, 5, 2), (7, 6, 1), (7, 8, 2), (8, 8, 1), (9, 9, 2),
+                        (7, 5, 1), (7, 4, 2), (8, 6, 1), (5, 6, 2), (8, 7, 1), (8, 4, 2)],
+    # White to move has an open three against black's broken three
+    'near_win_attack': [(7, 7, 1), (8, 8, 2), (7, 6, 1), (8, 7, 2), (5, 5, 1), (8, 6, 2), (6, 9, 1)],
+    # Black to move wins at once
+    'near_win_five': [(7, 4, 1), (9, 9, 2), (7, 5, 1), (10, 9, 2), (7, 6, 1), (11, 9, 2), (7, 7, 1), (3, 3, 2)],
+}
+
+
+def _evaluate_after_move(ai: AI, board: Board, stone: int) -> float:
+    # The search's step to a leaf: a move made, the position evaluated and the move taken back. The
+    # same board evaluated over and over would only time the evaluator's cached totals, this times
+    # the incremental update of the four lines through the move as well
+    row, col = divmod(next(Board.bit_indices(board.candidates)), board.stride)
+    ai._make_move(board, row, col, stone)
+    score = ai._evaluate_board(board)
+    ai._unmake_move(board)
+    return score
+
+
+# (name, function(ai, board, stone)) of the micro benchmarks
+MICRO = [
+    ('evaluate_after_move', _evaluate_after_move),
+    ('check_win', lambda ai, board, stone: ai._check_win(board, stone)),
+    ('get_valid_moves', lambda ai, board, stone: ai._get_valid_moves(board)),
+    ('count_patterns', lambda ai, board, stone: ai._count_patterns(board, stone)),
+    ('threat_search', lambda ai, board, stone: ai._threat_move(board)),
+]
+
+
+def load_position(name: str) -> Tuple[Board, int]:
+    """
+    Args:
+        name: Key of POSITIONS
+
+    Returns:
+        Tuple of (board, stone to move)
+    """
+    board = Board()
+    for row, col, stone in POSITIONS[name]:
+        board.make_move(row, col, stone)
+    stone = Board.BLACK if len(board.history) % 2 == 0 else Board.WHITE
+    return board, stone
+
+
+def _create_ai(stone: int, depth: int, threat_depth: int = 8) -> AI:
+    return AI(player_stone=stone, opponent_stone=3 - stone, max_depth=depth, threat_depth=threat_depth)
+
+
+def time_call(function: Callable[[], object], repeat: int, min_time: float = 0.05) -> float:
+    """
+    Args:
+        function: Call to time
+        repeat: Number of measurements, the fastest one counts (the others caught noise)
+        min_time: Seconds every measurement runs for at least, short calls are looped
+
+    Returns:
+        Microseconds per call
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        if time.perf_counter() - start >= min_time:
+            break
+        loops *= 2
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / loops * 1e6
+
+
+def run_micro(repeat: int) -> Dict[str, Dict[str, float]]:
+    # Microseconds per call, by benchmark and position
+    results = {}
+    for name, function in MICRO:
+        results[name] = {}
+        for position in POSITIONS:
+            board, stone = load_position(position)
+            ai = _create_ai(stone, 1)
+            results[name][position] = time_call(lambda: function(ai, board, stone), repeat)
+    return results
+
+
+def run_search(depths: List[int], minimax_depth: int, repeat: int) -> List[Dict]:
+    """
+    Args:
+        depths: Search depths to run
+        minimax_depth: Deepest depth the plain minimax runs at (it grows exponentially)
+        repeat: Number of runs per search, the fastest one counts
+
+    Returns:
+        One record per (position, algorithm, depth) with the move, nodes, time and nodes/sec
+    """
+    results = []
+    for position in POSITIONS:
+        for algorithm in ('pruning', 'minimax'):
+            for depth in depths:
+                if algorithm == 'minimax' and depth > minimax_depth:
+                    continue
+                best_time = float('inf')
+                for _ in range(repeat):
+                    # A new AI every run, a warm transposition table would hide the real cost. The
+                    # threat search is off, it would answer the near win positions before the search
+                    # runs (it is timed on its own in the micro benchmarks)
+                    board, stone = load_position(position)
+                    ai = _create_ai(stone, depth, threat_depth=0)
+                    search = ai.ai_move_with_pruning if algorithm == 'pruning' else ai.ai_move_without_pruning
+                    start = time.perf_counter()
+                    move = search(board)
+                    best_time = min(best_time, time.perf_counter() - start)
+                results.append({'position': position, 'algorithm': algorithm, 'depth': depth,
+                                'move': list(move), 'nodes': ai.nodes, 'time_ms': best_time * 1000,
+                                'nodes_per_sec': ai.nodes / best_time if best_time else 0.0})
+    return results
+
+
+def compare(report: Dict, baseline: Dict, time_threshold: float, node_threshold: float) -> List[str]:
+    """
+    Args:
+        report: Report of this run
+        baseline: Report to compare against
+        time_threshold: Allowed slowdown as a fraction, e.g. 0.2 for 20%
+        node_threshold: Allowed growth of the searched nodes as a fraction
+
+    Returns:
+        One line per regression, empty if there is none
+    """
+    regressions = []
+    for name, positions in report['micro'].items():
+        for position, micros in positions.items():
+            before = baseline.get('micro', {}).get(name, {}).get(position)
+            if before and micros > before * (1 + time_threshold):
+                regressions.append(f"{name} {position}: {before:.1f}us -> {micros:.1f}us")
+
+    old_searches = {(entry['position'], entry['algorithm'], entry['depth']): entry for entry in baseline.get('search', [])}
+    for entry in report['search']:
+        before = old_searches.get((entry['position'], entry['algorithm'], entry['depth']))
+        if before is None:
+            continue
+        label = f"{entry['algorithm']} depth {entry['depth']} {entry['position']}"
+        if entry['move'] != before['move']:
+            regressions.append(f"{label}: move {tuple(before['move'])} -> {tuple(entry['move'])}")
+        if entry['nodes'] > before['nodes'] * (1 + node_threshold):
+            regressions.append(f"{label}: {before['nodes']} -> {entry['nodes']} nodes")
+        # Searches answered in well under a millisecond are all noise
+        if before['time_ms'] >= 1 and entry['time_ms'] > before['time_ms'] * (1 + time_threshold):
+            regressions.append(f"{label}: {before['time_ms']:.1f}ms -> {entry['time_ms']:.1f}ms")
+    return regressions
+
+
+def minimax_score(position: str, depth: int, move: Tuple[int, int]) -> float:
+    # Score of a root move by the plain minimax, from the side to move's point of view
+    board, stone = load_position(position)
+    ai = _create_ai(stone, depth, threat_depth=0)
+    ai._make_move(board, move[0], move[1], stone)
+    return -ai._negamax_without_pruning(board, depth - 1, 3 - stone, move)
+
+
+def check_agreement(report: Dict) -> List[str]:
+    """
+    Args:
+        report: Report of this run
+
+    Returns:
+        One line per position and depth where alpha-beta played a move the plain minimax scores
+        lower than its own. Equal scores are fine, the two break ties in a different order
+    """
+    minimax = {(entry['position'], entry['depth']): tuple(entry['move']) for entry in report['search']
+               if entry['algorithm'] == 'minimax'}
+    mismatches = []
+    for entry in report['search']:
+        position, depth, move = entry['position'], entry['depth'], tuple(entry['move'])
+        expected = minimax.get((position, depth))
+        if entry['algorithm'] != 'pruning' or expected is None or move == expected:
+            continue
+        score, expected_score = minimax_score(position, depth, move), minimax_score(position, depth, expected)
+        if score != expected_score:
+            mismatches.append(f"depth {depth} {position}: pruning {move} scores {score}, minimax {expected} {expected_score}")
+    return mismatches
+
+
+def run(depths: List[int], minimax_depth: int, repeat: int) -> Dict:
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'depths': depths, 'minimax_depth': minimax_depth,
+            'micro': run_micro(repeat), 'search': run_search(depths, minimax_depth, max(1, repeat // 2))}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the search and evaluation hot paths")
+    parser.add_argument('--depths', type=int, nargs='+', default=[1, 2, 3, 4])
+    parser.add_argument('--minimax-depth', type=int, default=3, help='Deepest depth the plain minimax runs at')
+    parser.add_argument('--repeat', type=int, default=5, help='Measurements per micro benchmark (half as many per search)')
+    parser.add_argument('--out', default=None, help='Report file (JSON), stdout if not given')
+    parser.add_argument('--baseline', default=None, help='Report to compare against')
+    parser.add_argument('--save-baseline', default=None, help='Also write the report here, to compare later runs against')
+    parser.add_argument('--time-threshold', type=float, default=0.25, help='Allowed slowdown, 0.25 is 25%%')
+    parser.add_argument('--node-threshold', type=float, default=0.0, help='Allowed growth of the searched nodes')
+    args = parser.parse_args(argv)
+
+    report = run(args.depths, args.minimax_depth, args.repeat)
+
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            file.write(text)
+
+    for entry in report['search']:
+        print(f"{entry['algorithm']:8} depth {entry['depth']} {entry['position']:16} move {tuple(entry['move'])} "
+              f"{entry['nodes']:8} nodes {entry['time_ms']:9.1f}ms {entry['nodes_per_sec']:9.0f} nodes/s", file=sys.stderr)
+
+    # Alpha-beta has to find a move as good as the plain minimax's, a faster search that plays worse is a bug
+    mismatches = check_agreement(report)
+    for line in mismatches:
+        print(f"MISMATCH {line}", file=sys.stderr)
+    if mismatches:
+        return 1
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.time_threshold, args.node_threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("no regressions against", args.baseline, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from Engine.Board import Board
+from AI.AI import AI
+from AI.OpeningBook import canonical_key, to_canonical, write_book
+
+# Builds an opening book by deep offline search. Starting from the empty board every position
+# gets its best move searched, then the `width` most promising moves are played to reach the
+# positions of the next ply. Rotated / mirrored copies of a position are only searched once.
+# Run from src/, e.g.
+#   python -m Tools.BuildOpeningBook --out book.bin --plies 6 --width 3 --depth 4
+
+
+def _analyse(size: int, history: List[Tuple[int, int, int]], depth: int, width: int):
+    """
+    Args:
+        size: Size of the board
+        history: Moves of the position as (row, col, stone)
+        depth: Search depth for the book move
+        width: Number of moves to expand into the next ply
+
+    Returns:
+        Tuple of (history, canonical key, symmetry, book move, moves to expand)
+    """
+    board = Board(size)
+    for row, col, stone in history:
+        board.make_move(row, col, stone)
+    stone = Board.BLACK if len(history) % 2 == 0 else Board.WHITE
+
+    ai = AI(board_size=size, player_stone=stone, opponent_stone=3 - stone, max_depth=depth)
+    move = ai.ai_move_with_pruning(board)
+    key, symmetry = canonical_key(board, stone)
+
+    # The book move first, then the best ordered alternatives
+    expand = [move] + [candidate for candidate in ai._order_moves(board, ai._get_valid_moves(board), stone, 0)
+                       if candidate != move][:width - 1]
+    return history, key, symmetry, move, expand
+
+
+def build_book(plies: int, width: int, depth: int, workers: Optional[int] = None,
+               size: int = Board.DIMENSIONS) -> Dict[int, Tuple[Tuple[int, int], int]]:
+    """
+    Args:
+        plies: Number of plies (stones on the board) the book covers
+        width: Number of moves expanded per position
+        depth: Search depth for every book move
+        workers: Number of worker processes (defaults to the number of CPUs)
+        size: Size of the board the book is for
+
+    Returns:
+        Canonical key -> (move in the canonical orientation, depth), ready for write_book
+    """
+    entries = {}
+    frontier = [[]]
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as executor:
+        for ply in range(plies):
+            start = time.perf_counter()
+            next_frontier = []
+            seen = set()
+            results = executor.map(_analyse, [size] * len(frontier), frontier, [depth] * len(frontier), [width] * len(frontier))
+            for history, key, symmetry, move, expand in results:
+                entries[key] = (to_canonical(size, symmetry, move), depth)
+                stone = Board.BLACK if len(history) % 2 == 0 else Board.WHITE
+                for row, col in expand:
+                    child = history + [(row, col, stone)]
+                    board = Board(size)
+                    for r, c, s in child:
+                        board.make_move(r, c, s)
+                    child_key, _ = canonical_key(board, 3 - stone)
+                    if child_key not in seen and child_key not in entries:
+                        seen.add(child_key)
+                        next_frontier.append(child)
+            print(f"ply {ply}: {len(frontier)} positions in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            frontier = next_frontier
+    return entries
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build an opening book by offline search")
+    parser.add_argument('--out', default='opening_book.bin')
+    parser.add_argument('--plies', type=int, default=4, help='Number of stones on the board the book covers')
+    parser.add_argument('--width', type=int, default=3, help='Moves expanded per position')
+    parser.add_argument('--depth', type=int, default=3, help='Search depth of every book move')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--size', type=int, default=Board.DIMENSIONS, help='Board size, the book only answers on boards of this size')
+    args = parser.parse_args(argv)
+
+    entries = build_book(args.plies, args.width, args.depth, args.workers, args.size)
+    write_book(args.out, entries, args.size)
+    print(f"{len(entries)} positions written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
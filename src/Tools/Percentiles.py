@@ -0,0 +1,14 @@
+import math
+from typing import List
+
+# Summary statistics of timings, shared by the tools that report response times
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    # Nearest rank percentile: the smallest value with at least `fraction` of the values at or below
+    # it, 0 for an empty list. The product is rounded first, 0.07 * 100 is 7.000000000000001 in floats
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, math.ceil(round(fraction * len(ordered), 9)) - 1))
+    return ordered[rank]
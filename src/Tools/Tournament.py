@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
+from Engine.Board import Board
+from Engine.Manager import Manager
+from Engine.GameRecord import GameRecordWriter
+from Tools.Percentiles import percentile
+from AI.AI import AI
+
+if TYPE_CHECKING:
+    from AI.MCTS import MCTS     # needs NumPy, imported only when an 'mcts' player is created
+
+# Headless self-play: plays games between two AI setups on a process pool and writes the
+# results to a JSON file. No pygame needed. Run from src/, e.g.
+#   python -m Tools.Tournament --first '{"name": "ab3", "depth": 3}' \
+#       --second '{"name": "mm2", "depth": 2, "algorithm": "minimax"}' --games 200 --out results.json
+# or a selective search against a full width one:
+#   python -m Tools.Tournament --first '{"name": "ab3", "depth": 3}' \
+#       --second '{"name": "sel4", "depth": 4, "beam_width": 8, "lmr_moves": 4}' --games 40
+# or Monte Carlo tree search (needs NumPy) at half a second a move:
+#   python -m Tools.Tournament --first '{"name": "ab3", "depth": 3}' \
+#       --second '{"name": "mcts", "algorithm": "mcts", "time_limit_ms": 500}' --games 20
+
+
+# The random opening stones go within this many cells of the center
+OPENING_RADIUS = 2
+
+# At most four stones a colour: the opening box has room for far more, but a fifth stone could make
+# a five before the AIs even start
+MAX_OPENING_MOVES = 8
+
+
+class PlayerConfig:
+    ALGORITHMS = ('pruning', 'minimax', 'iterative', 'mcts')
+
+    def __init__(self, name: str, depth: int = 2, algorithm: str = 'pruning',
+                 time_limit_ms: Optional[float] = None, weights: Optional[Dict[str, float]] = None,
+                 beam_width: int = 0, lmr_moves: int = 0, lmr_reduction: int = 1):
+        """
+        Args:
+            name: Name used in the results
+            depth: Search depth (maximum depth for 'iterative')
+            algorithm: 'pruning' (ai_move_with_pruning), 'minimax' (ai_move_without_pruning)
+                'iterative' (ai_move with time_limit_ms) or 'mcts' (MCTS.ai_move with time_limit_ms)
+            time_limit_ms: Time budget per move, only used by 'iterative' and 'mcts'
+            weights: Pattern weights overriding the AI defaults
+            beam_width: Selective search beam, see AI (0 searches every move)
+            lmr_moves: Moves searched before late move reductions start, see AI (0 turns them off)
+            lmr_reduction: Plies a late move is reduced by
+        """
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"unknown algorithm {algorithm!r}, expected one of {self.ALGORITHMS}")
+        self.name = name
+        self.depth = depth
+        self.algorithm = algorithm
+        self.time_limit_ms = time_limit_ms
+        self.weights = weights or {}
+        self.beam_width = beam_width
+        self.lmr_moves = lmr_moves
+        self.lmr_reduction = lmr_reduction
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PlayerConfig':
+        return cls(**data)
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'depth': self.depth, 'algorithm': self.algorithm,
+                'time_limit_ms': self.time_limit_ms, 'weights': self.weights, 'beam_width': self.beam_width,
+                'lmr_moves': self.lmr_moves, 'lmr_reduction': self.lmr_reduction}
+
+    def create_ai(self, stone: int) -> Union[AI, 'MCTS']:
+        if self.algorithm == 'mcts':
+            from AI.MCTS import MCTS
+            return MCTS(player_stone=stone, opponent_stone=3 - stone, time_limit_ms=self.time_limit_ms or 1000,
+                        weights={**AI.WEIGHTS, **self.weights})
+        ai = AI(player_stone=stone, opponent_stone=3 - stone, max_depth=self.depth, beam_width=self.beam_width,
+                lmr_moves=self.lmr_moves, lmr_reduction=self.lmr_reduction)
+        ai.weights.update(self.weights)
+        return ai
+
+    def choose_move(self, ai: Union[AI, 'MCTS'], board: Board):
+        if self.algorithm == 'pruning':
+            return ai.ai_move_with_pruning(board)
+        if self.algorithm == 'minimax':
+            return ai.ai_move_without_pruning(board)
+        if self.algorithm == 'mcts':
+            return ai.ai_move(board)
+        return ai.ai_move(board, time_limit_ms=self.time_limit_ms, max_depth=self.depth)
+
+
+def _random_opening(board: Board, manager: Manager, count: int, rng: random.Random):
+    # A few random stones around the center, otherwise two deterministic AIs replay the same game
+    if not 0 <= count <= MAX_OPENING_MOVES:
+        raise ValueError(f"opening_moves must be from 0 to {MAX_OPENING_MOVES}, got {count}")
+    center = board.size // 2
+    color = Board.BLACK
+    while len(board.history) < count:
+        row = center + rng.randint(-OPENING_RADIUS, OPENING_RADIUS)
+        col = center + rng.randint(-OPENING_RADIUS, OPENING_RADIUS)
+        if manager.play(row, col, color) != -1:
+            color = 3 - color
+
+
+def play_game(index: int, black: Dict, white: Dict, opening_moves: int = 2, seed: int = 0) -> Dict:
+    """
+    Args:
+        index: Game number, also used to seed the opening
+        black: PlayerConfig.to_dict() of the black player
+        white: PlayerConfig.to_dict() of the white player
+        opening_moves: Number of random stones played before the AIs take over
+        seed: Seed of the tournament
+
+    Returns:
+        Dictionary with the result (Manager.DRAW / BLACK_WIN / WHITE_WIN), the moves and
+        the time (ms) and nodes of every AI move of each colour
+    """
+    board = Board()
+    manager = Manager(board)
+    _random_opening(board, manager, opening_moves, random.Random(seed * 1000003 + index))
+
+    players = {Board.BLACK: PlayerConfig.from_dict(black), Board.WHITE: PlayerConfig.from_dict(white)}
+    ais = {stone: config.create_ai(stone) for stone, config in players.items()}
+    times = {Board.BLACK: [], Board.WHITE: []}
+    nodes = {Board.BLACK: [], Board.WHITE: []}
+
+    color = Board.BLACK if len(board.history) % 2 == 0 else Board.WHITE
+    result = 0
+    while result == 0:
+        ai = ais[color]
+        nodes_before = ai.nodes
+        start = time.perf_counter()
+        row, col = players[color].choose_move(ai, board)
+        times[color].append((time.perf_counter() - start) * 1000)
+        nodes[color].append(ai.nodes - nodes_before)
+
+        result = manager.play(row, col, color)
+        if result == -1:
+            raise RuntimeError(f"{players[color].name} played an occupied cell {(row, col)} in game {index}")
+        color = 3 - color
+
+    return {'index': index, 'black': black['name'], 'white': white['name'], 'result': result,
+            'moves': [list(move) for move in board.history],
+            'times_ms': {'black': times[Board.BLACK], 'white': times[Board.WHITE]},
+            'nodes': {'black': nodes[Board.BLACK], 'white': nodes[Board.WHITE]}}
+
+
+def summarize(games: List[Dict], names: List[str]) -> Dict:
+    stats = {name: {'wins': 0, 'draws': 0, 'losses': 0, 'games_as_black': 0, 'times': [], 'nodes': 0}
+             for name in names}
+    for game in games:
+        for stone, colour in ((Board.BLACK, 'black'), (Board.WHITE, 'white')):
+            entry = stats[game[colour]]
+            entry['times'].extend(game['times_ms'][colour])
+            entry['nodes'] += sum(game['nodes'][colour])
+            if stone == Board.BLACK:
+                entry['games_as_black'] += 1
+            if game['result'] == Manager.DRAW:
+                entry['draws'] += 1
+            elif (game['result'] == Manager.BLACK_WIN) == (stone == Board.BLACK):
+                entry['wins'] += 1
+            else:
+                entry['losses'] += 1
+
+    summary = {}
+    for name, entry in stats.items():
+        times = entry.pop('times')
+        total_seconds = sum(times) / 1000
+        entry['moves'] = len(times)
+        entry['move_time_ms'] = {'mean': sum(times) / len(times) if times else 0.0,
+                                 'p50': percentile(times, 0.5), 'p90': percentile(times, 0.9),
+                                 'p99': percentile(times, 0.99), 'max': max(times, default=0.0)}
+        entry['nodes_per_sec'] = entry['nodes'] / total_seconds if total_seconds else 0.0
+        summary[name] = entry
+    return summary
+
+
+def run_tournament(first: PlayerConfig, second: PlayerConfig, games: int, workers: Optional[int] = None,
+                   opening_moves: int = 2, seed: int = 0, records: Optional[str] = None) -> Dict:
+    """
+    Args:
+        first: First AI setup, plays black in the even numbered games
+        second: Second AI setup, plays black in the odd numbered games
+        games: Number of games
+        workers: Number of worker processes (defaults to the number of CPUs)
+        opening_moves: Number of random stones played before the AIs take over
+        seed: Seed for the random openings
+        records: Game record file (see Engine/GameRecord.py) every game is appended to, if any
+
+    Returns:
+        Dictionary with the setups, a per setup summary and every game
+    """
+    if first.name == second.name:
+        raise ValueError("both setups have the same name, results could not be told apart")
+
+    first_dict, second_dict = first.to_dict(), second.to_dict()
+    blacks = [first_dict if index % 2 == 0 else second_dict for index in range(games)]
+    whites = [second_dict if index % 2 == 0 else first_dict for index in range(games)]
+
+    recorder = GameRecordWriter(records) if records else None
+    results = []
+    try:
+        with ProcessPoolExecutor(workers or os.cpu_count() or 1) as executor:
+            for game in executor.map(play_game, range(games), blacks, whites,
+                                     [opening_moves] * games, [seed] * games, chunksize=max(1, games // 64)):
+                results.append(game)
+                if recorder is not None:
+                    recorder.write_game(game['moves'], game['result'])
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    return {'setups': [first_dict, second_dict], 'opening_moves': opening_moves, 'seed': seed,
+            'summary': summarize(results, [first.name, second.name]), 'games': results}
+
+
+def _opening_moves(text: str) -> int:
+    try:
+        count = int(text)
+    except ValueError:
+        count = -1
+    if not 0 <= count <= MAX_OPENING_MOVES:
+        raise argparse.ArgumentTypeError(f"must be from 0 to {MAX_OPENING_MOVES}")
+    return count
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Play headless games between two AI setups")
+    parser.add_argument('--first', default='{"name": "pruning", "depth": 2}',
+                        help='JSON PlayerConfig, e.g. \'{"name": "ab3", "depth": 3, "algorithm": "pruning"}\'')
+    parser.add_argument('--second', default='{"name": "minimax", "depth": 2, "algorithm": "minimax"}',
+                        help='JSON PlayerConfig of the second setup')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--opening-moves', type=_opening_moves, default=2,
+                        help=f'Random stones played before the AIs take over, at most {MAX_OPENING_MOVES}')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='tournament_results.json', help='Results file (JSON)')
+    parser.add_argument('--records', default=None, help='Also append every game to this binary game record file')
+    args = parser.parse_args(argv)
+
+    first = PlayerConfig.from_dict(json.loads(args.first))
+    second = PlayerConfig.from_dict(json.loads(args.second))
+    start = time.perf_counter()
+    results = run_tournament(first, second, args.games, args.workers, args.opening_moves, args.seed, args.records)
+    with open(args.out, 'w') as file:
+        json.dump(results, file)
+
+    print(f"{args.games} games in {time.perf_counter() - start:.1f}s, results in {args.out}", file=sys.stderr)
+    for name, entry in results['summary'].items():
+        print(f"{name}: +{entry['wins']} ={entry['draws']} -{entry['losses']}  "
+              f"p50 {entry['move_time_ms']['p50']:.1f}ms p99 {entry['move_time_ms']['p99']:.1f}ms  "
+              f"{entry['nodes_per_sec']:.0f} nodes/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
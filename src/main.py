@@ -1,25 +1,63 @@
 import pygame
 from Engine import Board 
 from Engine import Manager
+from Engine import GameRecord
 from GUI import GuiManager
 from GUI import UtilizationGui
 from AI import AI
+from AI import Ponderer
+from AI import SearchWorker
+import sys
 import time
 
-gui = GuiManager.Gui()
+# Board size from the command line, e.g. `python main.py 19` for a Go board (15 by default)
+BOARD_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else Board.Board.DIMENSIONS
+if BOARD_SIZE < 5:
+    sys.exit(f"The board needs room for five in a row, {BOARD_SIZE} is too small (5 at least)")
+
+# Game record file every game played here is appended to (see Engine/GameRecord.py), only if one is
+# given after the board size, e.g. `python main.py 15 games_15x15.gmk`
+GAME_RECORDS = sys.argv[2] if len(sys.argv) > 2 else None
+
+# Frame cap of the event loop while the AI thinks, it redraws only what changed
+FPS = 30
+
+gui = GuiManager.Gui(BOARD_SIZE)
+pygame.event.set_blocked(pygame.MOUSEMOTION)   # nothing follows the mouse, no need to wake up for it
+clock = pygame.time.Clock()
 # Game loop
 running = True
 
 mode_selected = UtilizationGui.Constants.INVALID_MODE
 color_to_play = Board.Board.BLACK
-board = Board.Board()
-manager = Manager.Manager(board)
-ai = AI.AI()
+board = Board.Board(BOARD_SIZE)
+recorder = GameRecord.GameRecordWriter(GAME_RECORDS, BOARD_SIZE) if GAME_RECORDS else None
+manager = Manager.Manager(board, recorder)
+# Every AI move is logged as one line of JSON (its SearchStats) on stdout
+ai = AI.AI(board_size=BOARD_SIZE, collect_stats=True)
+# Searches the AI's answers to the human's likely moves while the human thinks (mode 2)
+ponderer = Ponderer.Ponderer(ai)
+# AI moves run on a worker thread, the future of the one being searched is kept in search
+worker = SearchWorker.SearchWorker()
+search = None
+search_name = ""
+search_start = 0
 play_result = 0
 
+gui.present()
 while(running):   
-    for event in pygame.event.get():
+    # With no search running nobody but the user can change anything: sleep until an event comes
+    events = pygame.event.get() if search is not None else [pygame.event.wait()] + pygame.event.get()
+    for event in events:
+        if event.type == pygame.VIDEOEXPOSE:
+            gui.invalidate()
+
         if event.type == pygame.QUIT:
+            ponderer.stop()
+            worker.close()
+            manager.abandon()
+            if recorder is not None:
+                recorder.close()
             running = False
         
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -30,59 +68,57 @@ while(running):
 
                 if(mode_selected != UtilizationGui.Constants.INVALID_MODE):
                     gui.draw_board()
+                if(mode_selected == UtilizationGui.Constants.AI_VS_AI):
+                    color_to_play = Board.Board.WHITE   # the pruning AI (white) opens
 
             elif(play_result == -1 or play_result == 0):    # If the play result was messy or it was valid (no draw/wins)
                 if((mode_selected == 2 and color_to_play == Board.Board.BLACK) or mode_selected == 1):
                     col, row =gui.convert_pos_to_index(event.pos)
                     
-                    if(col>=0 and col<15 and row >=0 and row < 15):
+                    if(board.in_bounds(row, col)):
                         play_result = manager.play(row,col,color_to_play)
-                        if(play_result == -1):
-                            color_to_play = 3 - color_to_play   # will invert the play to make him try again
-
-                elif(mode_selected == 3):
-                    # Ai vs Ai
-                    print("Pruning White AI to play")
-                    start_time = time.time()
-                    x,y = ai.ai_move_with_pruning(board)
-                    end_time = time.time()
-                    print("Time taken by AI: ", end_time - start_time)
-                    print("Pruning AI played at X: ", x, "Y: ", y)
-                    color_to_play = Board.Board.WHITE
-                    play_result = manager.play(x,y,color_to_play)
-                    print("======================")
-                    print("Minimax Black AI to play")
-                    start_time = time.time()
-                    x,y = ai.ai_move_without_pruning(board)
-                    end_time = time.time()
-                    print("Time taken by AI: ", end_time - start_time)
-                    print("Minimax AI played at X: ", x, "Y: ", y)
-                    print("======================")
-                    color_to_play = Board.Board.BLACK
-                    play_result = manager.play(x,y,color_to_play)
-                    if(play_result == -1):
-                        color_to_play = 3 - color_to_play
-                
-
-                else:
-                    print("AI to play")
-                    start_time = time.time()
-                    x,y = ai.ai_move_with_pruning(board)
-                    end_time = time.time()
-                    print("Time taken by AI: ", end_time - start_time)
-                    print("AI played at X: ", x, "Y: ", y)
-                    color_to_play = Board.Board.WHITE
-                    play_result = manager.play(x,y,color_to_play)
-                    if(play_result == -1):
-                        color_to_play = 3 - color_to_play
-
+                        if(play_result != -1):      # on -1 the same player tries again
+                            color_to_play = 3 - color_to_play
+                        gui.update_board(board.matrix)
+
+                        if(play_result != -1 and play_result != 0):
+                            gui.show_game_over(play_result)
+
+    if(running and search is not None):
+        if(search.done()):
+            x,y = search.result()
+            search = None
+            print(ai.last_stats.to_json(event="ai_move", player=search_name, color=color_to_play,
+                                        wall_ms=round((time.time() - search_start) * 1000, 3)), flush=True)
+            gui.clear_thinking()
+            play_result = manager.play(x,y,color_to_play)
+            if(play_result != -1):
+                color_to_play = 3 - color_to_play
+            if(play_result == 0 and mode_selected == 2):
+                ponderer.start(board)   # the human is to move
             gui.update_board(board.matrix)
-            color_to_play = 3 - color_to_play
 
             if(play_result != -1 and play_result != 0):
                 gui.show_game_over(play_result)
-
-    pygame.display.flip()
+        else:
+            gui.show_thinking(f"{search_name} thinking... {time.time() - search_start:.1f}s")
+
+    # Human vs AI: the AI plays white, AI vs AI: the pruning AI plays white and the minimax AI black
+    ai_to_play = (mode_selected == 2 and color_to_play == Board.Board.WHITE) or mode_selected == 3
+    if(running and ai_to_play and search is None and (play_result == -1 or play_result == 0)):
+        search_start = time.time()
+        if(mode_selected == 3 and color_to_play == Board.Board.BLACK):
+            search_name = "Minimax Black AI"
+            search = worker.submit(ai, ai.ai_move_without_pruning, board)
+        elif(mode_selected == 3):
+            search_name = "Pruning White AI"
+            search = worker.submit(ai, ai.ai_move_with_pruning, board)
+        else:
+            search_name = "AI"
+            search = worker.submit(ai, ponderer.ai_move_with_pruning, board)
+
+    gui.present()
+    clock.tick(FPS)
 
 
 
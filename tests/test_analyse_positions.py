@@ -0,0 +1,34 @@
+import pytest
+from Tools.AnalysePositions import RecordError, parse_record, positions
+
+BAD_LINES = [
+    '{"moves": [7, 7]}',                # moves that are not pairs
+    '[[7, 7, 9]]',                      # a stone that is neither black nor white
+    '[["a", 1]]',                       # coordinates that are not integers
+    '[[7.0, 7]]',
+    '[[true, 7]]',
+    '{"size": 100000, "moves": []}',    # a board far too large to set up
+    '{"size": true, "moves": []}',
+    '[[7, 7], [7, 7]]',                 # the same cell twice
+    '[[15, 0]]',                        # off the board
+]
+
+
+@pytest.mark.parametrize('line', BAD_LINES)
+def test_bad_lines_raise_record_error(line):
+    with pytest.raises(RecordError):
+        parse_record(line, 1, 15)
+
+
+def test_bad_lines_become_error_tasks():
+    lines = BAD_LINES + ['7,7 8,8']
+    tasks = list(positions(lines, 15, every_ply=False))
+    assert [task[0] for task in tasks[:-1]] == list(range(1, len(BAD_LINES) + 1))
+    assert all(isinstance(task[1], str) for task in tasks[:-1])
+    assert tasks[-1] == (len(lines), 2, 15, [(7, 7, 1), (8, 8, 2)])
+
+
+def test_valid_records():
+    assert parse_record('{"id": "g", "size": 9, "moves": [[4, 4], [3, 3, 2]]}', 1, 15) == \
+        {'id': 'g', 'size': 9, 'moves': [(4, 4, 1), (3, 3, 2)]}
+    assert parse_record('[[7, 7, 2], [8, 8]]', 3, 15)['moves'] == [(7, 7, 2), (8, 8, 1)]
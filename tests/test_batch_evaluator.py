@@ -0,0 +1,49 @@
+import random
+import pytest
+from Engine.Board import Board
+from AI.AI import AI
+
+# The batch evaluator is the one part of the engine that needs NumPy
+pytest.importorskip('numpy')
+from AI.BatchEvaluator import boards_to_array    # noqa: E402
+
+
+def _random_boards(size, count, seed):
+    # Positions of every density, black and white alternating from black, fives included
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = Board(size)
+        cells = rng.sample(range(size * size), rng.randint(0, size * size // 2))
+        for ply, cell in enumerate(cells):
+            board.make_move(*divmod(cell, size), Board.BLACK if ply % 2 == 0 else Board.WHITE)
+        boards.append(board)
+    return boards
+
+
+def _assert_batch_matches(size, count, seed):
+    boards = _random_boards(size, count, seed)
+    ai = AI(player_stone=Board.WHITE, opponent_stone=Board.BLACK, board_size=size)
+    array = boards_to_array(boards)
+    assert ai.evaluate_boards(array).tolist() == [ai._evaluate_board(board) for board in boards]
+    for stone in (Board.BLACK, Board.WHITE):
+        assert ai.count_patterns_batch(array, stone).tolist() == [ai._count_patterns(board, stone) for board in boards]
+
+
+@pytest.mark.parametrize('size', [9, 15, 19, 25])
+def test_batch_matches_per_board(size):
+    # 25x25 has lines longer than 20 cells, whose base-3 code does not fit 32 bits
+    _assert_batch_matches(size, 40, seed=size)
+
+
+def test_batch_with_custom_weights():
+    # Ties between shapes are broken the same way as PatternTable.line_score
+    boards = _random_boards(15, 40, seed=1)
+    ai = AI(board_size=15)
+    ai.weights.update({'open_three': ai.weights['four'], 'two': 0})
+    array = boards_to_array(boards)
+    assert ai.count_patterns_batch(array, Board.BLACK).tolist() == [ai._count_patterns(board, Board.BLACK) for board in boards]
+
+
+def test_lines_longer_than_one_key_word():
+    _assert_batch_matches(40, 5, seed=40)
@@ -0,0 +1,23 @@
+import random
+from Engine.Board import Board
+from AI.AI import AI
+
+
+def test_leaf_evaluation_matches_a_full_board_scan():
+    # Random games played and taken back move by move, the way the search follows a board
+    rng = random.Random(6)
+    ai = AI()
+    for size in (9, 15):
+        board = Board(size)
+        for ply in range(size * size // 2):
+            row, col = divmod(rng.choice([i for i in range(size * size) if board.get(*divmod(i, size)) == 0]), size)
+            ai._make_move(board, row, col, Board.BLACK if ply % 2 == 0 else Board.WHITE)
+            if ply % 7 == 6:
+                ai._unmake_move(board)
+            if board.has_five(ai.player_stone):
+                expected = float('inf')
+            elif board.has_five(ai.opponent_stone):
+                expected = float('-inf')
+            else:
+                expected = ai._count_patterns(board, ai.player_stone) - ai._count_patterns(board, ai.opponent_stone)
+            assert ai._evaluate_board(board) == expected
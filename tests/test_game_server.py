@@ -0,0 +1,27 @@
+import asyncio
+import json
+import pytest
+from Server.GameServer import GameServer
+
+BAD_REQUESTS = [
+    ({'op': ['x']}, "unknown op"),
+    ({'op': {'new': 1}}, "unknown op"),
+    ({'op': 'play', 'game': ['x'], 'row': 7, 'col': 7}, "no game"),
+    ({'op': 'state', 'game': {'id': 1}}, "no game"),
+    ({'op': 'state', 'game': True}, "no game"),
+    ({'op': 'close', 'game': 'nope'}, "no game"),
+]
+
+
+@pytest.mark.parametrize('request_, error', BAD_REQUESTS)
+def test_malformed_fields_get_protocol_errors(request_, error):
+    async def ask():
+        server = GameServer(workers=1)
+        try:
+            return await server.handle_line(json.dumps(dict(request_, id=5)).encode())
+        finally:
+            await server.close()
+
+    response = asyncio.run(ask())
+    assert response['ok'] is False and response['id'] == 5
+    assert response['error'].startswith(error)
@@ -0,0 +1,17 @@
+import pytest
+from Tools.Percentiles import percentile
+
+
+@pytest.mark.parametrize('values, fraction, expected', [
+    (list(range(1, 11)), 0.5, 5),
+    (list(range(1, 11)), 0.9, 9),
+    (list(range(1, 101)), 0.99, 99),
+    (list(range(1, 101)), 0.07, 7),
+    (list(range(1, 11)), 0.95, 10),
+    (list(range(1, 11)), 1.0, 10),
+    (list(range(1, 11)), 0.0, 1),
+    ([3.0], 0.5, 3.0),
+    ([], 0.5, 0.0),
+])
+def test_nearest_rank(values, fraction, expected):
+    assert percentile(values[::-1], fraction) == expected
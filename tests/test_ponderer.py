@@ -0,0 +1,41 @@
+from Engine.Board import Board
+from AI.AI import AI
+from AI.Ponderer import Ponderer
+
+
+def _board():
+    board = Board()
+    for ply, (row, col) in enumerate([(7, 7), (8, 8), (7, 8)]):
+        board.make_move(row, col, Board.BLACK if ply % 2 == 0 else Board.WHITE)
+    return board
+
+
+def test_pondering_leaves_the_next_search_its_seed():
+    ai = AI(max_depth=2, threat_depth=0, collect_stats=True)
+    ponderer = Ponderer(ai)
+    board = _board()
+    move = ai.ai_move_with_pruning(board)
+    last_root, last_stats = ai._last_root, ai.last_stats
+    board.make_move(move[0], move[1], ai.player_stone)
+
+    ponderer.start(board)
+    ponderer._thread.join()
+    ponderer.stop()
+    assert ponderer.results
+    assert ai._last_root == last_root and ai.last_stats is last_stats
+
+
+def test_ponder_hit_seeds_the_next_search():
+    ai = AI(max_depth=2, threat_depth=0)
+    ponderer = Ponderer(ai)
+    board = _board()
+    move = ai.ai_move_with_pruning(board)
+    board.make_move(move[0], move[1], ai.player_stone)
+    ponderer.start(board)
+    ponderer._thread.join()
+    reply = ponderer._expected_replies(board)[0]
+    board.make_move(reply[0], reply[1], ai.opponent_stone)
+    hits = ponderer.hits
+    ponderer.ai_move_with_pruning(board)
+    assert ponderer.hits == hits + 1
+    assert ai._last_root == (len(board.history), ponderer.results[ai._tt_key(board, True)][1])
@@ -0,0 +1,27 @@
+from Engine.Board import Board
+from Engine.SparseBoard import SparseBoard
+from AI.AI import AI
+
+# Three groups of stones far apart on a 60x60 board
+MOVES = [(10, 10), (45, 48), (12, 50), (11, 9), (46, 47), (12, 51), (9, 11), (44, 49), (13, 49), (11, 12)]
+
+
+def test_window_grows_with_the_stones_not_their_spread():
+    board = SparseBoard()
+    for ply, (row, col) in enumerate([(0, 0), (1, 1), (100000, 100000)]):
+        board.make_move(row, col, Board.BLACK if ply % 2 == 0 else Board.WHITE)
+    view, rows, cols = board.window(10)
+    assert view.size <= 48
+    assert [view.get(rows.index(row), cols.index(col)) for row, col, _ in board.history] == [1, 2, 1]
+
+
+def test_window_search_matches_the_whole_board():
+    sparse, dense = SparseBoard(60), Board(60)
+    for ply, (row, col) in enumerate(MOVES):
+        stone = Board.BLACK if ply % 2 == 0 else Board.WHITE
+        sparse.make_move(row, col, stone)
+        dense.make_move(row, col, stone)
+    on_window = AI(player_stone=Board.BLACK, opponent_stone=Board.WHITE, max_depth=2, threat_depth=0)
+    on_board = AI(player_stone=Board.BLACK, opponent_stone=Board.WHITE, max_depth=2, threat_depth=0)
+    assert on_window.ai_move_with_pruning(sparse) == on_board.ai_move_with_pruning(dense)
+    assert on_window.nodes == on_board.nodes
@@ -0,0 +1,37 @@
+import time
+import pytest
+from Engine.Board import Board
+from AI.AI import AI
+
+# Middle-game positions where the VCT solver alone runs for one to three seconds
+POSITIONS = [
+    [(7, 7), (9, 5), (6, 6), (4, 4), (4, 6), (6, 2), (5, 0), (5, 3), (7, 6)],
+    [(7, 7), (6, 6), (5, 7), (6, 7), (4, 6), (6, 8), (6, 5), (8, 10), (5, 5), (6, 10), (6, 9), (2, 6), (3, 5)],
+    [(7, 7), (6, 6), (6, 9), (7, 6), (6, 8), (8, 6), (9, 6), (5, 6), (4, 6), (5, 7), (7, 8), (8, 7), (5, 8), (8, 4)],
+]
+
+TIME_LIMIT_MS = 50
+MARGIN_MS = 50
+
+
+def _board(moves):
+    board = Board()
+    for ply, (row, col) in enumerate(moves):
+        board.make_move(row, col, Board.BLACK if ply % 2 == 0 else Board.WHITE)
+    return board
+
+
+@pytest.mark.parametrize('moves', POSITIONS)
+@pytest.mark.parametrize('settings', [{'threat_depth': 0}, {}, {'use_vct': True}])
+def test_ai_move_keeps_to_the_time_limit(moves, settings):
+    board = _board(moves)
+    stone = Board.BLACK if len(moves) % 2 == 0 else Board.WHITE
+    ai = AI(player_stone=stone, opponent_stone=3 - stone, **settings)
+
+    start = time.perf_counter()
+    row, col = ai.ai_move(board, time_limit_ms=TIME_LIMIT_MS)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    assert elapsed_ms < TIME_LIMIT_MS + MARGIN_MS
+    assert board.get(row, col) == 0
+    assert len(board.history) == len(moves)